@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +28,9 @@ SECRET_KEY = 'django-insecure-r0(f^@8__y&+3661h2&1$3ryksfw$fonsmtibe7)r^idk%d%k*
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# Ejecución de las pruebas (manage.py test), usan capas y cachés en memoria en lugar de Redis
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Agregar la dirección de la maquina virtual en caso de no tener dominio
 
 ALLOWED_HOSTS = ['interferometryapp.com', 'www.interferometryapp.com', 'localhost', '127.0.0.1', '10.0.2.2']
@@ -55,8 +59,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'interferometer.middlewares.CheckUserAdminMiddleware',
-    'interferometer.middlewares.CheckImageMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -107,6 +109,44 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'API.wsgi.application'
+ASGI_APPLICATION = 'API.asgi.application'
+
+# Servidor Redis compartido por gunicorn y daphne
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# Canal WebSocket de resultados de simulación (interferometer/consumers.py). simuAdmin (gunicorn) y
+# los participantes (daphne) están en procesos distintos, por lo que se usa Redis; la capa en memoria
+# solo funciona dentro de un proceso y se usa en desarrollo (DEBUG) y en las pruebas.
+if DEBUG or TESTING:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+
+# Caché de Django. Las entradas de la simulación (SIMULATION_CONTEXT_CACHE) se invalidan desde el
+# worker que atiende la escritura, por lo que la caché debe ser compartida por todos los workers de
+# gunicorn; en desarrollo (DEBUG) y en las pruebas se usa la caché en memoria del proceso.
+if DEBUG or TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
@@ -174,7 +214,91 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-from firebase_admin import initialize_app, credentials
-_credentials = os.path.join(BASE_DIR, 'credentials/interferometer-2f734-firebase-adminsdk-l7r4u-179584feb0.json')
-cred = credentials.Certificate(_credentials)
-initialize_app(cred)
+# Transformación de coordenadas geodésicas a ENU (interferometer/functions.py)
+# "wgs84": transformación cerrada con NumPy, "astropy": marcos de referencia de astropy
+GEODETIC_TRANSFORM = 'wgs84'
+
+# Cobertura UV (interferometer/functions.py): cantidad de ángulos horarios que se rotan a la vez
+# y tipo de dato de las coordenadas uv
+COVERAGE_CHUNK_SIZE = 256
+COVERAGE_DTYPE = 'float32'
+
+# Observaciones largas (interferometer/functions.py, "streaming_sampling"): desde MIN_SAMPLES
+# muestras uv (ángulos horarios x baselines) la cobertura se acumula en la grilla por bloques de
+# BLOCK_SIZE ángulos horarios y solo se conservan MAX_COVERAGE_POINTS muestras para su gráfico
+SIMULATION_STREAMING = {
+    'MIN_SAMPLES': 2000000,
+    'BLOCK_SIZE': 32,
+    'MAX_COVERAGE_POINTS': 200000,
+}
+
+# Solo se calculan los baselines (i, j) con i < j, el par (j, i) se agrega al cuadricular
+HERMITIAN_BASELINES = True
+
+# Generación de imagenes (interferometer/render.py)
+# "matplotlib": figuras con título y ejes, "fast": colormap con NumPy y cv2.imencode, más rápido
+# pero sin título ni ejes
+RENDERER = 'matplotlib'
+
+# Caché de resultados de simulación (interferometer/cache.py)
+# BACKEND: "local" (memoria del proceso) o "django" (usa CACHES[ALIAS], compartido entre procesos)
+SIMULATION_CACHE = {
+    'BACKEND': 'local',
+    'ALIAS': 'default',
+    'MAX_ENTRIES': 32,
+    'TIMEOUT': 300,
+    'WAIT_TIMEOUT': 120,
+}
+
+# Caché de las entradas de la simulación por grupo (interferometer/context.py), usa CACHES[ALIAS].
+# Con varios workers el alias debe ser compartido (Redis) para que la invalidación llegue a todos.
+SIMULATION_CONTEXT_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 30,
+}
+
+# Caché de baselines ecuatoriales por proceso (interferometer/geometry.py)
+# TOLERANCE: metros a los que se cuantizan las posiciones en la llave, 0 desactiva la caché
+# MAX_GROUPS: grupos con geometría incremental (GroupGeometry) en memoria
+BASELINE_GEOMETRY_CACHE = {
+    'TOLERANCE': 0.05,
+    'MAX_ENTRIES': 64,
+    'MAX_GROUPS': 16,
+    'TIMEOUT': 600,
+}
+
+# Pool de procesos de simulación por worker de gunicorn (interferometer/executor.py)
+# BACKEND: "process" o "inline" (en el proceso de la petición); WORKERS: None usa los núcleos / WEB_CONCURRENCY
+SIMULATION_EXECUTOR = {
+    'BACKEND': 'process',
+    'WORKERS': None,
+    'MAX_TASKS_PER_CHILD': 100,
+    'QUEUE_DEPTH': 4,
+    'QUEUE_TIMEOUT': 30,
+}
+
+# Simulaciones del administrador en segundo plano (interferometer/jobs.py)
+# EXECUTOR: "thread" (pool de WORKERS hilos) o "inline"; TIMEOUT: segundos sin avance para dar por fallido un trabajo
+SIMULATION_JOBS = {
+    'EXECUTOR': 'thread',
+    'WORKERS': 2,
+    'TIMEOUT': 600,
+}
+
+# Envío de notificaciones FCM en segundo plano (interferometer/notifications.py)
+# BATCH_SIZE: tokens por mensaje (máximo 500 en FCM), BACKOFF: segundos antes del primer reintento
+FCM_NOTIFICATIONS = {
+    'BATCH_SIZE': 500,
+    'MAX_RETRIES': 3,
+    'BACKOFF': 1.0,
+    'QUEUE_SIZE': 100,
+}
+
+# Caché de imagenes modelo y sus espectros (interferometer/spectra.py), presupuesto en bytes por proceso
+MODEL_IMAGE_CACHE = {
+    'MAX_BYTES': 256 * 1024 * 1024,
+}
+
+# Credenciales de Firebase. La app de firebase_admin se inicializa en el primer envío de
+# notificaciones (interferometer/notifications.py) y no al cargar los settings.
+FIREBASE_CREDENTIALS = os.path.join(BASE_DIR, 'credentials/interferometer-2f734-firebase-adminsdk-l7r4u-179584feb0.json')
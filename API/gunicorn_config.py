@@ -1,4 +1,56 @@
+import multiprocessing
+import os
+
+# Workers de gunicorn y procesos de simulación se reparten los núcleos: cada worker crea un pool
+# de cpu_count // workers procesos (ver "interferometer/executor.py"), que lee WEB_CONCURRENCY.
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, cpu_count // 2)))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Con gthread un worker sigue atendiendo peticiones mientras sus simulaciones corren en el pool
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# La aplicación y las librerías científicas se cargan una vez en el maestro antes del fork
+preload_app = True
+
+# Una simulación puede tardar varios segundos
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 60
+keepalive = 5
+
+# Reinicia cada worker luego de una cantidad de peticiones, con un desfase para que no se
+# reinicien todos a la vez
+max_requests = 1000
+max_requests_jitter = 100
+
 bind = "127.0.0.1:8000"
-loglevel = "debug"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
 accesslog = "-"
-access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
\ No newline at end of file
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+def on_starting(server):
+    # Comprobaciones de la base de datos e imagenes modelo, una vez en el maestro y no en cada
+    # worker. La conexión se cierra para que los workers no la hereden en el fork.
+    import django
+    from django.core.management import call_command
+    from django.db import connections
+    django.setup()
+    call_command("deploy_checks")
+    connections.close_all()
+
+
+def when_ready(server):
+    # Django ya está configurado (preload_app), se importan las vistas y sus dependencias
+    from interferometer.startup import preload_modules
+    preload_modules()
+
+
+def post_fork(server, worker):
+    from django.conf import settings
+    from interferometer.startup import warm_caches
+    warm_caches()
+    if settings.SIMULATION_EXECUTOR.get("BACKEND") == "process":
+        from interferometer.executor import get_executor
+        get_executor().warm_up()
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class InterferometerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interferometer'
+
+    def ready(self):
+        # Registra las señales que invalidan la caché de entradas de la simulación
+        from . import signals  # noqa: F401
+        # Registra las comprobaciones de despliegue
+        from . import checks  # noqa: F401
@@ -0,0 +1,96 @@
+import os
+import shutil
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Simulation
+from .render import OUTPUT_NAMES
+
+"""
+Almacenamiento de los resultados de simulación del administrador.
+
+Cada vez que el administrador simula se guarda una nueva versión de las cuatro imagenes
+resultantes en MEDIA_ROOT/simulations/<grupo>/<versión>/, ruta que nginx sirve directamente.
+Los participantes solo necesitan consultar la versión actual del grupo para obtenerlas.
+"""
+
+# Cantidad de versiones que se mantienen en disco por grupo. Se conserva la anterior para
+# que los participantes que aún la están descargando no reciban un 404.
+KEEP_VERSIONS = 2
+
+
+def _group_dir(group_id):
+    return os.path.join(settings.MEDIA_ROOT, "simulations", str(group_id))
+
+
+def artifact_path(group_id, version, name):
+    return os.path.join(_group_dir(group_id), str(version), f"{name}.png")
+
+
+def artifact_url(group_id, version, name):
+    return f"{settings.MEDIA_URL}simulations/{group_id}/{version}/{name}.png"
+
+
+def artifact_urls(base_url, group_id, version, outputs=OUTPUT_NAMES):
+    """
+    Retorna las URL absolutas de las imagenes guardadas de una versión, en el orden de las salidas.
+
+    base_url: URL del servidor, por ejemplo request.build_absolute_uri("/").
+    """
+    return [urljoin(base_url, artifact_url(group_id, version, name)) for name in outputs]
+
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def _prune_versions(group_id, version):
+    group_dir = _group_dir(group_id)
+    for entry in os.listdir(group_dir):
+        if entry.isdigit() and int(entry) <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(group_dir, entry), ignore_errors=True)
+
+
+def store_simulation(group_id, images):
+    """
+    Guarda una nueva versión del resultado de simulación de un grupo.
+
+    group_id: ID del grupo.
+    images: diccionario nombre -> PNG con las imagenes de OUTPUT_NAMES.
+
+    Retorna la instancia de Simulation con la versión guardada.
+    """
+    with transaction.atomic():
+        simulation, _ = Simulation.objects.select_for_update().get_or_create(
+            actual_group_id=group_id
+        )
+        version = simulation.version + 1
+        os.makedirs(os.path.join(_group_dir(group_id), str(version)), exist_ok=True)
+        for name in OUTPUT_NAMES:
+            _write_atomic(artifact_path(group_id, version, name), images[name])
+        simulation.version = version
+        simulation.save()
+
+    _prune_versions(group_id, version)
+    return simulation
+
+
+def read_simulation(simulation, outputs=OUTPUT_NAMES):
+    """
+    Lee desde disco las imagenes solicitadas de la versión guardada y las retorna como un
+    diccionario nombre -> PNG. Retorna None si los archivos de la versión ya no existen.
+    """
+    images = {}
+    for name in outputs:
+        path = artifact_path(simulation.actual_group_id, simulation.version, name)
+        try:
+            with open(path, "rb") as file:
+                images[name] = file.read()
+        except FileNotFoundError:
+            return None
+    return images
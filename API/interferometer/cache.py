@@ -0,0 +1,270 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+"""
+Caché de resultados de simulación.
+
+Todos los participantes de un grupo solicitan la misma simulación (mismas posiciones,
+punto de referencia, parametros e imagen modelo), por lo tanto el resultado se guarda
+bajo una llave que corresponde al hash de dichas entradas. La primera petición calcula
+el resultado y las peticiones concurrentes con la misma llave esperan a que termine
+en lugar de volver a calcularlo.
+
+El backend es intercambiable:
+    - "local": memoria del proceso con desalojo LRU y TTL.
+    - "django": framework de caché de Django (compartido entre procesos si el backend
+      configurado en CACHES lo es, por ejemplo Redis o Memcached).
+"""
+
+# Campos de Parameters que influyen en el resultado de la simulación
+SIMULATION_FIELDS = (
+    "observationTime",
+    "declination",
+    "samplingTime",
+    "frequency",
+    "idPath",
+    "scale",
+    "scheme",
+    "robust_param",
+)
+
+
+def simulation_key(positions, reference, parameters, image_id, image_name=None):
+    """
+    Calcula la llave de caché a partir de las entradas de la simulación.
+
+    positions: arreglo (N,3) con latitud, longitud y altitud de los dispositivos.
+    reference: arreglo (3,) con latitud, longitud y altitud del punto de referencia.
+    parameters: diccionario con los parametros de la simulación (ver SIMULATION_FIELDS).
+    image_id: ID de la imagen modelo.
+    image_name: nombre del archivo de la imagen modelo, cambia cuando la imagen es reemplazada.
+    """
+    digest = hashlib.sha256()
+    for array in (positions, reference):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    for field in SIMULATION_FIELDS:
+        digest.update(f"{field}={parameters.get(field)!r};".encode())
+    digest.update(f"image={image_id}:{image_name}".encode())
+    return digest.hexdigest()
+
+
+class LocalMemoryBackend:
+    """
+    Backend en memoria del proceso. Desaloja la entrada usada hace más tiempo cuando se
+    supera max_entries y descarta las entradas con más de ttl segundos de antigüedad.
+    """
+
+    def __init__(self, max_entries=32, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def acquire(self, key):
+        # La espera entre hilos del mismo proceso la resuelve ResultCache
+        return True
+
+    def release(self, key):
+        pass
+
+    def is_locked(self, key):
+        return False
+
+
+class DjangoCacheBackend:
+    """
+    Backend sobre el framework de caché de Django. Para que las peticiones de distintos
+    procesos esperen al mismo cálculo se utiliza una llave de bloqueo creada con
+    cache.add, que es atómico en los backends compartidos.
+
+    El alias puede ser compartido con otras cachés (por ejemplo SIMULATION_CONTEXT_CACHE), por lo
+    que las llaves incluyen una generación guardada en la misma caché y clear() solo la incrementa;
+    las entradas anteriores quedan inaccesibles y expiran con su TTL.
+    """
+
+    def __init__(self, alias="default", ttl=300, prefix="simulation", lock_timeout=120):
+        self.alias = alias
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation(self):
+        generation_key = f"{self.prefix}:generation"
+        generation = self.cache.get(generation_key)
+        if generation is None:
+            self.cache.add(generation_key, 0, None)
+            generation = self.cache.get(generation_key, 0)
+        return generation
+
+    def _key(self, key):
+        return f"{self.prefix}:{self._generation()}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def clear(self):
+        generation_key = f"{self.prefix}:generation"
+        try:
+            self.cache.incr(generation_key)
+        except ValueError:
+            self.cache.add(generation_key, 1, None)
+
+    def _lock_key(self, key):
+        # Sin la generación, para que un clear() entre acquire y release no deje el bloqueo tomado
+        return f"{self.prefix}:lock:{key}"
+
+    def acquire(self, key):
+        return self.cache.add(self._lock_key(key), 1, self.lock_timeout)
+
+    def release(self, key):
+        self.cache.delete(self._lock_key(key))
+
+    def is_locked(self, key):
+        return self.cache.get(self._lock_key(key)) is not None
+
+
+class ResultCache:
+    """
+    Caché de resultados con cálculo único por llave: si varias peticiones piden la misma
+    llave al mismo tiempo, solo la primera ejecuta compute() y el resto espera su resultado.
+    """
+
+    def __init__(self, backend, wait_timeout=120, poll_interval=0.1):
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if not owner:
+            # Otro hilo del proceso ya está calculando esta llave
+            event.wait(self.wait_timeout)
+            value = self.backend.get(key)
+            if value is not None:
+                return value
+
+        try:
+            value = self._compute_across_processes(key, compute)
+        finally:
+            if owner:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+        return value
+
+    def _compute_across_processes(self, key, compute):
+        deadline = time.monotonic() + self.wait_timeout
+        while not self.backend.acquire(key):
+            # Otro proceso está calculando esta llave, se espera a que publique el resultado
+            value = self.backend.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() > deadline or not self.backend.is_locked(key):
+                break
+            time.sleep(self.poll_interval)
+        else:
+            try:
+                value = compute()
+                self.backend.set(key, value)
+                return value
+            finally:
+                self.backend.release(key)
+
+        value = self.backend.get(key)
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def build_backend(config):
+    backend = config.get("BACKEND", "local")
+    ttl = config.get("TIMEOUT", 300)
+    if backend == "local":
+        return LocalMemoryBackend(max_entries=config.get("MAX_ENTRIES", 32), ttl=ttl)
+    if backend == "django":
+        return DjangoCacheBackend(alias=config.get("ALIAS", "default"), ttl=ttl)
+    raise ValueError("Not known cache backend")
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Retorna la caché de resultados del proceso, construida a partir de settings.SIMULATION_CACHE.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                config = getattr(settings, "SIMULATION_CACHE", {})
+                _result_cache = ResultCache(
+                    build_backend(config), wait_timeout=config.get("WAIT_TIMEOUT", 120)
+                )
+    return _result_cache
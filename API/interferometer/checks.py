@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+"""
+Comprobaciones de despliegue (manage.py check --deploy y el comando deploy_checks).
+
+simuAdmin se ejecuta en gunicorn y envía el resultado al canal WebSocket del grupo, que sirve
+daphne en otro proceso (ver "consumers.py"). Con la capa de canales en memoria esos mensajes
+nunca salen del proceso de gunicorn, por lo que fuera de DEBUG se exige una capa compartida.
+"""
+
+IN_MEMORY_CHANNEL_LAYER = "channels.layers.InMemoryChannelLayer"
+
+
+@register("interferometer", deploy=True)
+def check_channel_layer(app_configs, **kwargs):
+    backend = getattr(settings, "CHANNEL_LAYERS", {}).get("default", {}).get("BACKEND")
+    if settings.DEBUG or not getattr(settings, "ASGI_APPLICATION", None) or backend != IN_MEMORY_CHANNEL_LAYER:
+        return []
+    return [
+        Error(
+            "CHANNEL_LAYERS usa la capa en memoria, los resultados enviados desde gunicorn no llegan "
+            "a los participantes conectados a daphne.",
+            hint="Configure channels_redis.core.RedisChannelLayer en CHANNEL_LAYERS.",
+            id="interferometer.E001",
+        )
+    ]
@@ -0,0 +1,81 @@
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+
+from .artifacts import artifact_urls
+from .models import Simulation
+
+"""
+Canal WebSocket de resultados de simulación por grupo.
+
+Los participantes se conectan a "ws/simulation/<grupo>/" y reciben un mensaje JSON cada vez
+que el administrador guarda una nueva versión del resultado del grupo, con la versión y las
+URL de las imagenes (servidas por nginx). Así el resultado se envía una sola vez a todos los
+participantes conectados en lugar de que cada uno lo pida a simuGuest.
+
+Al conectarse se envía la versión actual, si existe, con el mismo formato de los mensajes
+siguientes, para que un participante que se une tarde no tenga que esperar a la siguiente
+simulación.
+
+Los mensajes de simuAdmin (gunicorn) llegan a los participantes conectados a daphne solo a
+través de una capa de canales compartida entre procesos (ver "checks.py").
+"""
+
+
+def group_channel_name(group_id):
+    return f"simulation_{group_id}"
+
+
+def scope_base_url(scope):
+    """
+    URL del servidor a partir del header Host de la conexión, equivalente a
+    request.build_absolute_uri("/"). Sin Host se retorna "" y las URL quedan relativas.
+    """
+    host = dict(scope.get("headers", [])).get(b"host")
+    if host is None:
+        return ""
+    scheme = "https" if scope.get("scheme") == "wss" else "http"
+    return f"{scheme}://{host.decode('latin1')}/"
+
+
+@database_sync_to_async
+def _stored_version(group_id):
+    return Simulation.objects.filter(actual_group=group_id).values_list("version", flat=True).first()
+
+
+class SimulationConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        self.group_id = self.scope["url_route"]["kwargs"]["group_id"]
+        self.channel_group = group_channel_name(self.group_id)
+        await self.channel_layer.group_add(self.channel_group, self.channel_name)
+        await self.accept()
+        version = await _stored_version(self.group_id)
+        if version is not None:
+            await self.send_json({
+                "actual_group": self.group_id,
+                "version": version,
+                "images": artifact_urls(scope_base_url(self.scope), self.group_id, version),
+            })
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.channel_group, self.channel_name)
+
+    async def simulation_result(self, event):
+        await self.send_json(event["result"])
+
+
+def push_simulation_result(group_id, result):
+    """
+    Envía el resultado de una simulación a todos los participantes conectados al canal del grupo.
+
+    group_id: ID del grupo.
+    result: diccionario serializable a JSON, por ejemplo la versión y las URL de las imagenes.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        group_channel_name(group_id), {"type": "simulation.result", "result": result}
+    )
@@ -0,0 +1,181 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import SIMULATION_FIELDS
+from .models import Device, Group, Imagen, Parameters
+
+"""
+Carga de las entradas de la simulación de un grupo.
+
+Los dispositivos, el punto de referencia, los parametros y la imagen modelo de un grupo se
+obtienen en dos consultas: una para el grupo junto a su RefPoint (select_related), sus
+Parameters y el archivo de la imagen (subconsultas), y otra para los dispositivos.
+
+El resultado se guarda por grupo en la caché de Django (settings.SIMULATION_CONTEXT_CACHE) y
+se invalida con las señales de "signals.py" cada vez que se guarda o elimina un Device,
+RefPoint, Parameters o Imagen. Las actualizaciones masivas (QuerySet.update, bulk_update) no
+emiten señales, por lo que deben llamar a invalidate_simulation_context.
+
+Con varios workers de gunicorn la invalidación debe llegar a todos los procesos, por lo que fuera
+de DEBUG settings.CACHES usa Redis. Si el alias es una caché en memoria del proceso (LocMemCache)
+y hay más de un worker (WEB_CONCURRENCY), las entradas no se guardan en la caché.
+"""
+
+CONTEXT_KEY_PREFIX = "simulation-context"
+
+# Latitud, longitud y altitud de un dispositivo
+POSITION_DTYPE = np.dtype([("latitude", np.float64), ("longitude", np.float64), ("altitude", np.float64)])
+
+
+@dataclass
+class SimulationContext:
+    """
+    Entradas de la simulación de un grupo.
+
+    group_id: ID del grupo.
+    positions: arreglo (N,3) con latitud, longitud y altitud de los dispositivos con posición.
+    device_ids: IDs de los dispositivos de positions, en el mismo orden.
+    tokens: tokens FCM de los dispositivos del grupo.
+    reference: arreglo (3,) con latitud, longitud y altitud del punto de referencia, o None.
+    parameters: diccionario con los parametros guardados del grupo (ver SIMULATION_FIELDS), o None.
+    image_id: ID de la imagen modelo de los parametros, o None.
+    image_name: nombre del archivo de la imagen modelo, o None si la imagen no existe.
+    """
+    group_id: int
+    positions: np.ndarray
+    tokens: list
+    device_ids: list = None
+    reference: np.ndarray = None
+    parameters: dict = None
+    image_id: int = None
+    image_name: str = None
+
+
+def _device_rows(id_group):
+    # Los dispositivos se ordenan por ID para que la llave de caché de la simulación no
+    # dependa del orden en que los entrega la base de datos. Una altitud nula se considera 0.
+    return (
+        Device.objects.filter(actual_group=id_group)
+        .order_by("id")
+        .values_list(
+            "latitude",
+            "longitude",
+            Coalesce("altitude", Value(0.0, output_field=FloatField())),
+            "tokenFCM",
+            "id",
+        )
+    )
+
+
+def _located(rows):
+    # Los dispositivos sin latitud o longitud (aún no reportan su posición) se excluyen
+    return (row for row in rows if row[0] is not None and row[1] is not None)
+
+
+def _positions(rows):
+    located = (row[:3] for row in _located(rows))
+    return np.fromiter(located, dtype=POSITION_DTYPE).view(np.float64).reshape(-1, 3)
+
+
+def device_positions(id_group):
+    """
+    Retorna las posiciones de los dispositivos del grupo como un arreglo (N,3) con latitud,
+    longitud y altitud, directamente desde la base de datos y sin serializers.
+    """
+    return _positions(_device_rows(id_group))
+
+
+def context_key(id_group):
+    return f"{CONTEXT_KEY_PREFIX}:{id_group}"
+
+
+def _context_cache():
+    config = getattr(settings, "SIMULATION_CONTEXT_CACHE", {})
+    return caches[config.get("ALIAS", "default")], config.get("TIMEOUT", 30)
+
+
+def _process_local(cache):
+    # Una caché en memoria con varios workers no recibe la invalidación de los demás procesos
+    return isinstance(cache, LocMemCache) and int(os.environ.get("WEB_CONCURRENCY", 1)) > 1
+
+
+def fetch_simulation_context(id_group):
+    """
+    Consulta las entradas de la simulación del grupo en la base de datos, sin usar la caché.
+
+    Retorna un SimulationContext, o None si el grupo no existe.
+    """
+    parameters = Parameters.objects.filter(groupId=OuterRef("pk"))
+    annotations = {
+        f"parameters_{name}": Subquery(parameters.values(name)[:1]) for name in SIMULATION_FIELDS
+    }
+    annotations["parameters_id"] = Subquery(parameters.values("id")[:1])
+    annotations["image_name"] = Subquery(
+        Imagen.objects.filter(id=Subquery(parameters.values("idPath")[:1])).values("archivo")[:1]
+    )
+    group = (
+        Group.objects.filter(pk=id_group)
+        .select_related("refpoint")
+        .annotate(**annotations)
+        .first()
+    )
+    if group is None:
+        return None
+
+    rows = list(_device_rows(id_group))
+    context = SimulationContext(
+        group_id=group.pk,
+        positions=_positions(rows),
+        tokens=[row[3] for row in rows if row[3]],
+        device_ids=[row[4] for row in _located(rows)],
+    )
+    refpoint = getattr(group, "refpoint", None)
+    if refpoint is not None:
+        context.reference = np.array(
+            [refpoint.latitude, refpoint.longitude, refpoint.altitude], dtype=float
+        )
+    if group.parameters_id is not None:
+        context.parameters = {
+            name: getattr(group, f"parameters_{name}") for name in SIMULATION_FIELDS
+        }
+        context.image_id = context.parameters["idPath"]
+        context.image_name = group.image_name
+    return context
+
+
+def load_simulation_context(id_group):
+    """
+    Retorna las entradas de la simulación del grupo desde la caché, consultándolas en la base
+    de datos si no están. Retorna None si el grupo no existe.
+    """
+    try:
+        id_group = int(id_group)
+    except (TypeError, ValueError):
+        return None
+    cache, timeout = _context_cache()
+    if _process_local(cache):
+        return fetch_simulation_context(id_group)
+    key = context_key(id_group)
+    context = cache.get(key)
+    if context is None:
+        context = fetch_simulation_context(id_group)
+        if context is not None:
+            cache.set(key, context, timeout)
+    return context
+
+
+def invalidate_simulation_context(*group_ids):
+    """
+    Elimina de la caché las entradas de la simulación de los grupos indicados.
+    """
+    keys = [context_key(id_group) for id_group in group_ids if id_group is not None]
+    if keys:
+        cache, _ = _context_cache()
+        cache.delete_many(keys)
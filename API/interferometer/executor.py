@@ -0,0 +1,179 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import APIException
+
+from .functions import SimulationResult, simulation
+
+"""
+Ejecución de la simulación en un pool de procesos.
+
+La simulación ocupa la CPU (FFT de NumPy, gridding) y con un worker sync de gunicorn una
+simulación bloquea al worker completo. Con settings.SIMULATION_EXECUTOR["BACKEND"] = "process"
+cada worker de gunicorn envía las simulaciones a un ProcessPoolExecutor propio, creado en la
+primera simulación (luego del fork de gunicorn) con procesos "spawn" que importan de antemano
+astropy, matplotlib y cv2 (ver "startup.py").
+
+Los arreglos del resultado vuelven desde el proceso del pool en un bloque de memoria compartida
+(multiprocessing.shared_memory) en lugar de serializarse con pickle a través del pipe.
+
+La cantidad de simulaciones en curso o en espera por worker se limita a WORKERS + QUEUE_DEPTH;
+si no hay espacio en QUEUE_TIMEOUT segundos la petición responde 503 (ExecutorBusy).
+"""
+
+# Campos de SimulationResult que se copian a memoria compartida
+RESULT_ARRAYS = ("uv", "weights", "psf", "dirty")
+
+
+class ExecutorBusy(APIException):
+    status_code = 503
+    default_detail = "Servidor ocupado, intente nuevamente."
+    default_code = "executor_busy"
+
+
+def default_workers():
+    """
+    Cantidad de procesos del pool por worker de gunicorn, de modo que entre todos los workers
+    (WEB_CONCURRENCY, ver "gunicorn_config.py") se ocupen todos los núcleos.
+    """
+    web_workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    return max(1, (os.cpu_count() or 1) // max(1, web_workers))
+
+
+def _initialize(settings_module):
+    # Se ejecuta una vez en cada proceso del pool: configura Django e importa los módulos
+    # pesados para que la primera simulación del proceso no pague su importación.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+    from .startup import preload_modules
+    preload_modules()
+
+
+def _warm():
+    return os.getpid()
+
+
+def to_shared_memory(result):
+    """
+    Copia los arreglos de un SimulationResult a un bloque de memoria compartida.
+
+    Retorna el nombre del bloque, la descripción (campo, dtype, forma, offset) de cada arreglo y
+    el valor de hermitian. El bloque queda abierto hasta que from_shared_memory lo elimina.
+    """
+    arrays = [np.ascontiguousarray(getattr(result, name)) for name in RESULT_ARRAYS]
+    layout, offset = [], 0
+    for name, array in zip(RESULT_ARRAYS, arrays):
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    try:
+        for (_, dtype, shape, start), array in zip(layout, arrays):
+            np.ndarray(shape, dtype, buffer=block.buf, offset=start)[...] = array
+    finally:
+        block.close()
+    return block.name, layout, result.hermitian
+
+
+def from_shared_memory(name, layout, hermitian):
+    """
+    Reconstruye el SimulationResult desde el bloque de memoria compartida y elimina el bloque.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = {
+            field: np.ndarray(shape, dtype, buffer=block.buf, offset=start).copy()
+            for field, dtype, shape, start in layout
+        }
+    finally:
+        block.close()
+        block.unlink()
+    return SimulationResult(hermitian=hermitian, **arrays)
+
+
+def _simulate(args):
+    return to_shared_memory(simulation(*args))
+
+
+class SimulationExecutor:
+
+    """
+    Pool de procesos de simulación de un worker de gunicorn.
+
+    workers: cantidad de procesos, por defecto default_workers().
+    max_tasks_per_child: simulaciones que ejecuta un proceso antes de ser reemplazado.
+    queue_depth: simulaciones que pueden esperar además de las que están en curso.
+    queue_timeout: segundos que se espera por espacio en la cola antes de lanzar ExecutorBusy.
+    """
+
+    def __init__(self, workers=None, max_tasks_per_child=None, queue_depth=4, queue_timeout=30):
+        self.workers = workers or default_workers()
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.workers + queue_depth)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_initialize,
+            initargs=(settings.SETTINGS_MODULE,),
+            max_tasks_per_child=max_tasks_per_child,
+        )
+
+    def warm_up(self):
+        """
+        Inicia todos los procesos del pool sin esperar a que terminen sus importaciones.
+        """
+        for _ in range(self.workers):
+            self._pool.submit(_warm)
+
+    def run(self, *args):
+        """
+        Ejecuta functions.simulation(*args) en el pool y retorna el SimulationResult.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ExecutorBusy()
+        try:
+            return from_shared_memory(*self._pool.submit(_simulate, args).result())
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Retorna el pool de simulación del proceso, construido a partir de settings.SIMULATION_EXECUTOR.
+    Cada proceso (worker de gunicorn) tiene el suyo.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                config = getattr(settings, "SIMULATION_EXECUTOR", {})
+                _executor = SimulationExecutor(
+                    workers=config.get("WORKERS"),
+                    max_tasks_per_child=config.get("MAX_TASKS_PER_CHILD"),
+                    queue_depth=config.get("QUEUE_DEPTH", 4),
+                    queue_timeout=config.get("QUEUE_TIMEOUT", 30),
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def run_simulation(*args):
+    """
+    Ejecuta la simulación con los argumentos de functions.simulation, en el pool de procesos si
+    settings.SIMULATION_EXECUTOR["BACKEND"] es "process" o en el mismo proceso si es "inline".
+    """
+    if getattr(settings, "SIMULATION_EXECUTOR", {}).get("BACKEND", "inline") == "process":
+        return get_executor().run(*args)
+    return simulation(*args)
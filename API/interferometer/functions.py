@@ -1,15 +1,17 @@
 import numpy as np
-import matplotlib
-matplotlib.use('agg')
-import matplotlib.pyplot as plt
-import cv2
-from astropy.coordinates import EarthLocation, AltAz, ITRS
-from astropy.constants import c
-from io import BytesIO
-import base64
-import cmcrameri.cm as cmc
-
-const_c = c.value   # speed of light [m/s]
+from dataclasses import dataclass
+from django.conf import settings
+from .spectra import compute_spectrum, get_spectrum_cache
+
+# astropy solo se importa en las transformaciones que lo usan (geodetic_to_enu_astropy), así
+# importar este módulo no paga su costo de importación
+
+const_c = 299792458.0   # speed of light [m/s], igual a astropy.constants.c.value
+
+# Elipsoide WGS84
+WGS84_A = 6378137.0                  # semieje mayor [m]
+WGS84_F = 1 / 298.257223563          # achatamiento
+WGS84_E2 = WGS84_F * (2 - WGS84_F)   # excentricidad al cuadrado
 
 def weighting_scheme(weights, uv_pix_1d, N, scheme="natural", robust_param=2.):
     """ 
@@ -75,6 +77,7 @@ def new_positions(df, reference, scale):
         return arr
 
 def _earthlocation_to_altaz(location, reference_location):
+    from astropy.coordinates import AltAz, ITRS
     itrs_cart = location.get_itrs().cartesian
     itrs_ref_cart = reference_location.get_itrs().cartesian
     local_itrs = ITRS(itrs_cart - itrs_ref_cart, location=reference_location)
@@ -118,71 +121,172 @@ def compute_h(hObs, gradDec, t_muestreo):
     dec = np.radians(gradDec)
     return HA, dec
 
-def grid_sampling(piximg, max_B, coverage, wavelength, scheme, robust_param):
-    """ 
-    piximg: cantidad de pixeles de la imagen modelo, tiene que ser nxn
-    max_B: baseline mas largo
-    uvcoverage: array uv cobertura
-    wavelength: longitud de onda
-    scheme: tipo de esquema, natural, uniform o robust
+def hour_angle_blocks(hObs, t_muestreo, block_size=32):
+    """
+    hObs: tiempo de observación en horas
+    t_muestreo: tiempo de muestreo en minutos
+    block_size: cantidad de ángulos horarios por bloque
 
+    Genera los mismos ángulos horarios de compute_h, en bloques, sin crear el arreglo completo.
+    """
+    start = -np.radians(hObs * 15.0)
+    step = np.radians((t_muestreo/60)*15)
+    count = max(int(np.ceil(-2 * start / step)), 0)
+    # np.arange calcula cada valor como start + i * ((start + step) - start)
+    delta = (start + step) - start
+    for first in range(0, count, block_size):
+        yield start + np.arange(first, min(first + block_size, count)) * delta
+
+def uv_cell_size(piximg, max_B, wavelength):
+    """
+    Tamaño de celda delta_u de la grilla uv de grid_sampling.
     """
     min_lambda=wavelength #minima longitud de onda lambda
     delta_x = (min_lambda / max_B) / 7
-    delta_u = 1 / (piximg * delta_x)
+    return 1 / (piximg * delta_x)
 
-    u_pixel2 = np.floor(coverage[:, 0] / delta_u + piximg // 2).astype(int)
-    v_pixel2 = np.floor(coverage[:, 1] / delta_u + piximg // 2).astype(int)
+class IncrementalGridder:
+    """
+    Grilla uv con la cantidad de muestras por celda.
+
+    Como todas las muestras tienen peso 1, los pesos de weighting_scheme solo dependen de la
+    cantidad c de muestras de cada celda: natural entrega c, uniform 1 por celda ocupada y robust
+    c/(1 + c*f^2) con f^2 = (5*10^-robust_param)^2 * S / sum(c^3), donde S es el total de muestras.
+    Por lo tanto se pueden agregar o quitar muestras (por ejemplo las de un dispositivo que se
+    movió o las de nuevos ángulos horarios) sin volver a cuadricular el resto, y los pesos se
+    recalculan sobre las N x N celdas en lugar de sobre todas las muestras.
+
+    piximg: cantidad de pixeles por lado de la grilla.
+    delta_u: tamaño de celda (ver "uv_cell_size").
+    hermitian: cada muestra (u, v) también se agrega en (-u, -v) (ver "baselines").
+    """
 
-    weights = np.ones_like(u_pixel2, dtype=np.float32).ravel()
-    uv_pix_1d = piximg * v_pixel2 + u_pixel2
-    weights_after_scheme = weighting_scheme(weights, uv_pix_1d, piximg, scheme, robust_param)
-    weights_1d = np.bincount(uv_pix_1d, weights_after_scheme, minlength=piximg*piximg)
-    weight_image = np.reshape(weights_1d, (piximg,piximg))
-    
-    
-    #psf
-    #np.add.at(uvgrid, (v_pixel2, u_pixel2), 1.0 + 1j*0.0)
+    def __init__(self, piximg, delta_u, hermitian=False):
+        self.piximg = piximg
+        self.delta_u = delta_u
+        self.hermitian = hermitian
+        self.counts = np.zeros(piximg * piximg, dtype=np.int64)
+
+    def _cells(self, coverage):
+        scaled = np.asarray(coverage) / self.delta_u
+        signs = (1, -1) if self.hermitian else (1,)
+        for sign in signs:
+            u_pixel = np.floor(sign * scaled[:, 0] + self.piximg // 2).astype(np.intp)
+            v_pixel = np.floor(sign * scaled[:, 1] + self.piximg // 2).astype(np.intp)
+            yield self.piximg * v_pixel + u_pixel
+
+    def _update(self, coverage, sign):
+        for cells in self._cells(coverage):
+            if cells.size * 8 < self.counts.size:
+                # Pocas muestras: solo se modifican sus celdas
+                np.add.at(self.counts, cells, sign)
+            else:
+                self.counts += sign * np.bincount(cells, minlength=self.counts.size)
+
+    def add(self, coverage):
+        """
+        coverage: arreglo (M,2) de muestras uv a agregar.
+        """
+        self._update(coverage, 1)
+
+    def remove(self, coverage):
+        """
+        coverage: arreglo (M,2) de muestras uv agregadas anteriormente que se quitan.
+        """
+        self._update(coverage, -1)
+
+    def weights(self, scheme="natural", robust_param=2.):
+        """
+        Retorna la grilla de pesos (N,N) luego del esquema de ponderación, igual a la de grid_sampling.
+        """
+        counts = self.counts.astype(np.float64)
+        scheme = scheme.lower()
+        if scheme == "natural":
+            weights = counts
+        elif scheme == "uniform":
+            weights = (counts > 0).astype(np.float64)
+        elif scheme == "robust":
+            cubes = np.sum(counts**3)
+            f_squared = (5.* np.power(10, -robust_param))**2 * np.sum(counts) / cubes if cubes else 0.
+            weights = counts/(1.+(counts*f_squared))
+        else:
+            raise ValueError("Not known scheme")
+        return weights.reshape(self.piximg, self.piximg)
+
+def streaming_sampling(piximg, max_B, baselines, hObs, gradDec, t_muestreo, wavelength, scheme, robust_param,
+                       half=False, block_size=32, max_points=200000, dtype=np.float32):
+    """
+    Igual a coverage + grid_sampling, pero sin crear la cobertura uv completa: los baselines se
+    rotan por bloques de ángulo horario (ver "hour_angle_blocks") y cada bloque se acumula
+    directamente en la grilla (ver "IncrementalGridder").
+
+    max_points: cantidad máxima de muestras uv que se conservan para el gráfico de cobertura,
+    tomando una de cada k muestras en el orden de uv_coverage.
 
+    Retorna la cobertura reducida, si esta solo contiene la mitad (u, v) de los baselines, la
+    grilla de pesos y la PSF.
+    """
+    dec = np.radians(gradDec)
+    pairs = None if half else hermitian_pairs(baselines)
+    if pairs is not None:
+        # Los pares (j, i) se cuadriculan como el reflejo (-u, -v) de los pares (i, j)
+        baselines, half = baselines[:, pairs[0]], True
+    b_uv = baselines / wavelength
+    n_baselines = b_uv.shape[1]
+
+    step = np.radians((t_muestreo/60)*15)
+    n_samples = max(int(np.ceil(2 * np.radians(hObs * 15.0) / step)), 0) * n_baselines
+    stride = max(-(-n_samples // max_points), 1)
+
+    gridder = IncrementalGridder(piximg, uv_cell_size(piximg, max_B, wavelength), hermitian=half)
+    kept, offset = [], 0
+    for H in hour_angle_blocks(hObs, t_muestreo, block_size):
+        R_uv = calc_RR(H, dec)[:2]
+        uv = np.einsum("kct,cb->tbk", R_uv, b_uv).astype(dtype).reshape(-1, 2)
+        gridder.add(uv)
+        kept.append(uv[(-offset) % stride::stride].copy())
+        offset += len(uv)
+
+    uv_subset = np.concatenate(kept) if kept else np.empty((0, 2), dtype=dtype)
+    weight_image = gridder.weights(scheme, robust_param)
+    return uv_subset, half, weight_image, psf_from_weights(weight_image)
+
+def psf_from_weights(weight_image):
+    """
+    Point Spread Function normalizada a partir de la grilla de pesos.
+    """
     psf = np.fft.fftshift(np.fft.ifft2(np.fft.ifftshift(weight_image)))
     fft_norm = np.max(psf.real)
     psf/= fft_norm 
+    return psf.real
 
-    #se grafica
-    figurePSF = plt.figure(figsize=(8, 8))
-    plt.subplot()
-    plt.title('Point Spread Function')
-    plt.imshow(psf.real, cmap=cmc.tofino_r, vmax=0.1)
-    #se lleva a base64
-    bufPSF = BytesIO()
-    figurePSF.savefig(bufPSF, format='png')
-    image_psf_base64 = base64.b64encode(bufPSF.getvalue()).decode()
-    plt.close(figurePSF)
-    plt.clf()
-    plt.cla()
-    plt.close('all')  # Cierra todas las figuras abiertas
-
-    # Sampling
-    #se grafica
-    figure = plt.figure(figsize=(8, 8))
-    plt.subplot()
-    plt.title('Cobertura cuadriculada')
-    plt.imshow(weight_image, cmap=cmc.tofino_r)
-    #se lleva base64
-    buf = BytesIO()
-    figure.savefig(buf, format='png')
-    image_sampling_base64 = base64.b64encode(buf.getvalue()).decode()
-    plt.close(figure)
-    plt.clf()
-    plt.cla()
-    plt.close('all')  # Cierra todas las figuras abiertas
-    
-    return weight_image, image_sampling_base64, image_psf_base64
+def grid_sampling(piximg, max_B, coverage, wavelength, scheme, robust_param, hermitian=False):
+    """ 
+    piximg: cantidad de pixeles de la imagen modelo, tiene que ser nxn
+    max_B: baseline mas largo
+    uvcoverage: array uv cobertura
+    wavelength: longitud de onda
+    scheme: tipo de esquema, natural, uniform o robust
+    hermitian: si es True, la cobertura solo contiene la mitad de los baselines (ver "baselines")
+    y cada muestra (u, v) también se agrega en (-u, -v), en una sola pasada.
 
-def baselines(enu_coords):
+    Los pesos se calculan a partir de la cantidad de muestras por celda (ver "IncrementalGridder").
+    """
+    gridder = IncrementalGridder(piximg, uv_cell_size(piximg, max_B, wavelength), hermitian)
+    gridder.add(coverage)
+    weight_image = gridder.weights(scheme, robust_param)
+    return weight_image, psf_from_weights(weight_image)
+
+def baselines(enu_coords, half=False):
     """
     enu_coords: arreglo de coordenadas en el sistema de referencia plano tangente local (ENU)
+    half: si es True solo se retornan los baselines (i, j) con i < j. El baseline (j, i) es el
+    mismo con el signo opuesto, por lo que se agrega de forma implícita al momento de cuadricular
+    (ver "grid_sampling").
     """
+    if half:
+        i, j = np.triu_indices(enu_coords.shape[-1], k=1)
+        return enu_coords[:, i] - enu_coords[:, j]
     b_enu = enu_coords[..., np.newaxis] - enu_coords[:, np.newaxis,:]
     b_enu = b_enu[:, ~np.eye(b_enu.shape[-1],dtype=bool)]
     return b_enu
@@ -205,57 +309,216 @@ def bENU_to_bEquatorial(b_enu, lat_obs):
     
     return baseline_equatorial
 
-def coverage(baselines, HA, dec, wavelength):
+def equatorial_matrix(lat_obs):
+    """
+    lat_obs: latitud del centro del observatorio, expresado en grados
+    Retorna la matriz (3,3) M tal que bENU_to_bEquatorial(b_enu, lat_obs) = M @ b_enu. Como la
+    transformación es lineal, también se puede aplicar a la posición ENU de cada antena y luego
+    restar (ver "GroupGeometry" en "geometry.py").
+    """
+    latitude = np.radians(lat_obs)
+    return np.array([
+        [0., -np.sin(latitude), np.cos(latitude)],
+        [1., 0., 0.],
+        [0., np.cos(latitude), np.sin(latitude)],
+    ])
+
+def hermitian_pairs(baselines):
+    """
+    baselines: arreglo (3, B) de baselines en el orden entregado por la función "baselines",
+    es decir, todos los pares (i, j) con i != j recorridos por filas.
+
+    Cada baseline (i, j) tiene su par (j, i) con el signo opuesto. Retorna los índices de los
+    baselines con i < j y los índices de sus pares, o None si el arreglo no tiene esa forma.
+    """
+    n_baselines = baselines.shape[1]
+    n = int(round((1 + np.sqrt(1 + 4 * n_baselines)) / 2))
+    if n < 2 or n * (n - 1) != n_baselines:
+        return None
+    i, j = np.triu_indices(n, k=1)
+    half = i * (n - 1) + j - 1
+    mirror = j * (n - 1) + i
+    if not np.allclose(baselines[:, half], -baselines[:, mirror]):
+        return None
+    return half, mirror
+
+def uv_coverage(baselines, HA, dec, wavelength, chunk_size=256, dtype=np.float64, half=False):
+    """
+    baselines: arreglo de coordenadas de los baselines en el sistema ecuatorial
+    HA: Ángulo horario en radianes
+    dec: declinación en radianes
+    wavelength: longitud de onda
+    chunk_size: cantidad de ángulos horarios que se rotan a la vez
+    dtype: tipo de dato del arreglo de salida
+    half: los baselines solo contienen la mitad i < j (ver "baselines"), no se buscan pares
+
+    Calcula las coordenadas (u, v) de cada baseline para cada ángulo horario. En lugar de crear
+    la matriz temporal 3x3xTxB, se rota un bloque de ángulos horarios a la vez y el resultado se
+    escribe directamente en el arreglo de salida, cuyo orden es el mismo de antes: primero el
+    tiempo y luego los baselines. Si los baselines vienen en pares (i, j), (j, i) solo se rota
+    la mitad y la otra mitad se obtiene cambiando el signo.
+    """
+    HA = np.atleast_1d(HA)
+    n_baselines = baselines.shape[1]
+    pairs = None if half else hermitian_pairs(baselines)
+    if pairs is None:
+        half, mirror = np.arange(n_baselines), None
+    else:
+        half, mirror = pairs
+    b_half = baselines[:, half] / wavelength
+
+    UV_coverage = np.empty((HA.size * n_baselines, 2), dtype=dtype)
+    uv_grid = UV_coverage.reshape(HA.size, n_baselines, 2)
+    for start in range(0, HA.size, chunk_size):
+        H = HA[start:start + chunk_size]
+        # solo se necesitan las filas de u y v de la matriz de rotación
+        R_uv = calc_RR(H, dec)[:2]
+        uv = np.einsum("kct,cb->tbk", R_uv, b_half)
+        uv_grid[start:start + H.size, half] = uv
+        if mirror is not None:
+            uv_grid[start:start + H.size, mirror] = -uv
+    return UV_coverage
+
+def coverage(baselines, HA, dec, wavelength, chunk_size=256, dtype=np.float64, half=False):
     """
     baselines: arreglo de coordenadas de los baselines en el sistema ecuatorial
     HA: Ángulo horario en horas
     dec: declinación en radianes,
     wavelength: longitud de onda
+    chunk_size: cantidad de ángulos horarios que se rotan a la vez (ver "uv_coverage")
+    dtype: tipo de dato de las coordenadas uv
+    half: los baselines solo contienen la mitad i < j y se retorna solo la cobertura de dicha mitad.
+    """
+    return uv_coverage(baselines, HA, dec, wavelength, chunk_size, dtype, half)
+
+def fft_model_image(path, image_id=None):
     """
-    R_matrix = calc_RR(HA, dec)
-    uvw_dot = np.sum(R_matrix[...,np.newaxis]*baselines[np.newaxis,:,np.newaxis,:], axis=1)
-    UV_coverage = np.column_stack((uvw_dot[0].reshape(-1), uvw_dot[1].reshape(-1)))/wavelength
-
-    #se grafica
-    fig = plt.figure(figsize=(8,8))
-    plt.title("Cobertura UV")
-    plt.scatter(x=UV_coverage[:,0]/1000,y=UV_coverage[:,1]/1000, c="black", marker='.', s=0.4)
-    plt.xlabel(r'$u\ [k\lambda]$')  # Usa 'r' antes de la cadena de texto para que Python la trate como raw string
-    plt.ylabel(r'$v\ [k\lambda]$')
-    #se lleva a base64
-    buf = BytesIO()
-    fig.savefig(buf, format='png')
-    image_base64 = base64.b64encode(buf.getvalue()).decode()
-    plt.close(fig)
-    plt.clf()
-    plt.cla()
-    plt.close('all')  # Cierra todas las figuras abiertas
-
-    return UV_coverage, image_base64
-
-def fft_model_image(path):
-    img = cv2.imread(path,0)
-    ft_data = np.fft.fftshift(np.fft.fft2(np.fft.ifftshift(img)))
+    path: ruta de la imagen modelo
+    image_id: ID de la imagen en la base de datos. Si se entrega, la imagen y su espectro
+    se obtienen desde la caché de espectros del proceso.
+    """
+    if image_id is None:
+        img, ft_data = compute_spectrum(path)
+    else:
+        img, ft_data = get_spectrum_cache().get(image_id, path)
     pix = img.shape[0]
     return pix, ft_data
 
-def geodetic_to_enu(coords, reference_loc):
+def geodetic_to_ecef(lat, lon, alt):
+    """
+    lat: latitud en grados (WGS84)
+    lon: longitud en grados (WGS84)
+    alt: altitud sobre el elipsoide en metros
+    Retorna las coordenadas geocéntricas (ECEF) en metros, arreglo (3, N).
+    """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    N = WGS84_A / np.sqrt(1. - WGS84_E2 * sin_lat**2)   # radio de curvatura en el primer vertical
+    x = (N + alt) * cos_lat * np.cos(lon)
+    y = (N + alt) * cos_lat * np.sin(lon)
+    z = (N * (1. - WGS84_E2) + alt) * sin_lat
+    return np.array([x, y, z])
+
+def ecef_to_enu(ecef, reference_loc):
+    """
+    ecef: coordenadas geocéntricas (3, N) en metros
+    reference_loc: latitud, longitud y altitud del punto de referencia
+    Retorna las coordenadas en el plano tangente local del punto de referencia, con el mismo
+    orden y signo que earth_location_to_local_enu: (este, norte, -arriba).
+    """
+    lat = np.radians(reference_loc[0])
+    lon = np.radians(reference_loc[1])
+    ref_ecef = geodetic_to_ecef(reference_loc[0], reference_loc[1], reference_loc[2])
+    dx, dy, dz = ecef - ref_ecef.reshape(3, 1)
+    east = -np.sin(lon) * dx + np.cos(lon) * dy
+    north = -np.sin(lat) * np.cos(lon) * dx - np.sin(lat) * np.sin(lon) * dy + np.cos(lat) * dz
+    up = np.cos(lat) * np.cos(lon) * dx + np.cos(lat) * np.sin(lon) * dy + np.sin(lat) * dz
+    return np.array([east, north, -up])
+
+def geodetic_to_enu_astropy(coords, reference_loc):
+    from astropy.coordinates import EarthLocation
     ant_pos = EarthLocation.from_geodetic(coords[:,1], coords[:,0], coords[:,2])
     ref_loc = EarthLocation.from_geodetic(reference_loc[1],reference_loc[0],reference_loc[2])
     enu_coords = earth_location_to_local_enu(ant_pos, ref_loc)
     return enu_coords
 
-def simulation(t_obs, dec,t_muestreo, path, geodetic_coords, reference_location, frequency, scheme, robust_param):
-    wavelength = const_c / (frequency*1e9)
+def geodetic_to_enu(coords, reference_loc):
+    """
+    coords: arreglo (N,3) con latitud, longitud y altitud de las antenas
+    reference_loc: latitud, longitud y altitud del punto de referencia
+
+    Por defecto se utiliza la transformación cerrada geodésica -> ECEF -> ENU sobre el elipsoide
+    WGS84, la cual coincide con la transformación de astropy (geodetic_to_enu_astropy) con un error
+    menor a 1e-6 metros para distancias de decenas de kilómetros. Con settings.GEODETIC_TRANSFORM = "astropy"
+    se utiliza la transformación de astropy.
+    """
+    if getattr(settings, "GEODETIC_TRANSFORM", "wgs84") == "astropy":
+        return geodetic_to_enu_astropy(coords, reference_loc)
+    ecef = geodetic_to_ecef(coords[:,0], coords[:,1], coords[:,2])
+    return ecef_to_enu(ecef, reference_loc)
+
+@dataclass
+class SimulationResult:
+    """
+    Resultado numérico de la simulación. Las imagenes se generan por separado y solo cuando
+    se solicitan (ver "render.py").
+
+    uv: cobertura uv (M,2). Si hermitian es True solo contiene la mitad (u, v), la otra es (-u, -v).
+    hermitian: indica si uv contiene solo la mitad de la cobertura.
+    weights: grilla de pesos (N,N) luego del esquema de ponderación.
+    psf: Point Spread Function (N,N) normalizada.
+    dirty: imagen sucia (N,N).
+    """
+    uv: np.ndarray
+    hermitian: bool
+    weights: np.ndarray
+    psf: np.ndarray
+    dirty: np.ndarray
+
+def equatorial_baselines(geodetic_coords, reference_location, half):
+    """
+    geodetic_coords: arreglo (N,3) con latitud, longitud y altitud de las antenas
+    reference_location: latitud, longitud y altitud del punto de referencia
+    half: ver "baselines"
+    Retorna los baselines en coordenadas ecuatoriales, arreglo (3, B).
+    """
     enu_coords = geodetic_to_enu(geodetic_coords, reference_location)
-    baseline = baselines(enu_coords)
-    baseline_equatorial = bENU_to_bEquatorial(baseline, reference_location[0])
-    HA, dec = compute_h(t_obs, dec, t_muestreo)
-    UV_coverage, img_coverage = coverage(baseline_equatorial, HA, dec,wavelength)
-    pixels, ffts=fft_model_image(path)
-    sampling, img_sampling, img_psf = grid_sampling(pixels, np.max(np.abs(baseline_equatorial)), UV_coverage, wavelength, scheme, robust_param)
+    baseline = baselines(enu_coords, half)
+    return bENU_to_bEquatorial(baseline, reference_location[0])
+
+def simulation(t_obs, dec,t_muestreo, path, geodetic_coords, reference_location, frequency, scheme, robust_param, image_id=None, baseline_equatorial=None):
+    """
+    baseline_equatorial: baselines ecuatoriales ya calculados para geodetic_coords (ver "geometry.py"),
+    con settings.HERMITIAN_BASELINES. Si es None se calculan.
+    """
+    wavelength = const_c / (frequency*1e9)
+    half = getattr(settings, "HERMITIAN_BASELINES", True)
+    if baseline_equatorial is None:
+        baseline_equatorial = equatorial_baselines(geodetic_coords, reference_location, half)
+    dtype = np.dtype(getattr(settings, "COVERAGE_DTYPE", "float32"))
+    pixels, ffts=fft_model_image(path, image_id)
+    max_B = np.max(np.abs(baseline_equatorial))
+    streaming = getattr(settings, "SIMULATION_STREAMING", {})
+    n_samples = (t_obs * 60 * 2 / t_muestreo) * baseline_equatorial.shape[1]
+    if n_samples > streaming.get("MIN_SAMPLES", 2000000):
+        # Observaciones largas: la cobertura completa nunca se crea, solo se conserva una parte
+        UV_coverage, half, sampling, psf = streaming_sampling(
+            pixels, max_B, baseline_equatorial, t_obs, dec, t_muestreo, wavelength, scheme, robust_param,
+            half=half,
+            block_size=streaming.get("BLOCK_SIZE", 32),
+            max_points=streaming.get("MAX_COVERAGE_POINTS", 200000),
+            dtype=dtype,
+        )
+    else:
+        HA, dec = compute_h(t_obs, dec, t_muestreo)
+        UV_coverage = coverage(
+            baseline_equatorial, HA, dec, wavelength,
+            chunk_size=getattr(settings, "COVERAGE_CHUNK_SIZE", 256),
+            dtype=dtype,
+            half=half,
+        )
+        sampling, psf = grid_sampling(pixels, max_B, UV_coverage, wavelength, scheme, robust_param, hermitian=half)
     obs= (np.fft.ifftshift(np.fft.ifft2(np.fft.fftshift(ffts*sampling)))).real
-    boolean, buffer = cv2.imencode(".png", obs)
-    stream = BytesIO(buffer)
-    img_dirty_base64 = base64.b64encode(stream.getvalue()).decode()
-    return img_dirty_base64, img_coverage, img_sampling, img_psf
+    return SimulationResult(UV_coverage, half, sampling, psf, obs)
@@ -0,0 +1,290 @@
+import hashlib
+import threading
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .cache import LocalMemoryBackend
+from .functions import equatorial_baselines, equatorial_matrix, geodetic_to_enu
+
+"""
+Caché de la geometría de los baselines.
+
+Entre simulaciones sucesivas de una sesión los dispositivos casi no se mueven y normalmente solo
+cambian los parametros (frecuencia, declinación, esquema). Los baselines ecuatoriales solo
+dependen de las posiciones y del punto de referencia, por lo que se guardan en memoria del
+proceso bajo una llave calculada con las posiciones cuantizadas a
+settings.BASELINE_GEOMETRY_CACHE["TOLERANCE"] metros. Un cambio de parametros solo vuelve a
+calcular la rotación por ángulo horario y el gridding.
+
+Cuando la llave no está en la caché (por ejemplo, un dispositivo se movió) los baselines del grupo
+se obtienen desde su GroupGeometry, que guarda la posición ecuatorial de cada dispositivo y la
+matriz de baselines, y solo recalcula las filas y columnas de los dispositivos que cambiaron.
+"""
+
+# Metros por grado de latitud (y cota superior de los metros por grado de longitud)
+METERS_PER_DEGREE = 111320.0
+
+
+def quantize_positions(geodetic_coords, tolerance):
+    """
+    Cuantiza latitud y longitud (grados) y altitud (metros) a pasos de tolerance metros.
+    Retorna un arreglo (N,3) de enteros.
+    """
+    coords = np.asarray(geodetic_coords, dtype=np.float64).reshape(-1, 3)
+    step = np.array([tolerance / METERS_PER_DEGREE, tolerance / METERS_PER_DEGREE, tolerance])
+    return np.rint(coords / step).astype(np.int64)
+
+
+def geometry_key(geodetic_coords, reference_location, half, tolerance):
+    """
+    Llave de caché de la geometría: posiciones cuantizadas, punto de referencia exacto, half y
+    la transformación geodésica configurada.
+    """
+    digest = hashlib.sha256()
+    positions = quantize_positions(geodetic_coords, tolerance)
+    digest.update(str(positions.shape).encode())
+    digest.update(positions.tobytes())
+    digest.update(np.ascontiguousarray(reference_location, dtype=np.float64).tobytes())
+    digest.update(f"half={half};transform={getattr(settings, 'GEODETIC_TRANSFORM', 'wgs84')}".encode())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=16)
+def _pair_index(n, capacity, half):
+    # Índices planos de los pares (i, j) en una matriz de capacity x capacity, en el orden de "baselines"
+    if half:
+        i, j = np.triu_indices(n, k=1)
+    else:
+        i, j = np.nonzero(~np.eye(n, dtype=bool))
+    index = i * capacity + j
+    index.setflags(write=False)
+    return index
+
+
+class GroupGeometry:
+
+    """
+    Geometría incremental de los dispositivos de un grupo.
+
+    Como la transformación ENU -> ecuatorial es lineal (ver "equatorial_matrix"), se guarda la
+    posición ecuatorial p_i de cada dispositivo y la matriz de baselines b[:, i, j] = p_i - p_j.
+    Mover, agregar o eliminar un dispositivo solo actualiza su fila y su columna, es decir,
+    2(N-1) baselines en O(N).
+
+    reference_location: latitud, longitud y altitud del punto de referencia.
+    half: ver "baselines".
+    """
+
+    # Si cambia más de esta fracción de los dispositivos se recalcula todo de una vez
+    REBUILD_FRACTION = 0.25
+
+    def __init__(self, reference_location, half=True, capacity=16):
+        self.reference = np.array(reference_location, dtype=np.float64)
+        self.half = half
+        self.lock = threading.Lock()
+        self._rotation = equatorial_matrix(self.reference[0])
+        self._ids = []
+        self._rows = {}
+        self._positions = np.empty((capacity, 3))
+        self._vectors = np.empty((3, capacity))
+        self._baselines = np.zeros((3, capacity, capacity))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _equatorial(self, geodetic_coords):
+        return self._rotation @ geodetic_to_enu(np.asarray(geodetic_coords).reshape(-1, 3), self.reference)
+
+    def _reserve(self, size):
+        capacity = self._positions.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        n = len(self)
+        positions, vectors, baselines = self._positions, self._vectors, self._baselines
+        self._positions = np.empty((capacity, 3))
+        self._vectors = np.empty((3, capacity))
+        self._baselines = np.zeros((3, capacity, capacity))
+        self._positions[:n] = positions[:n]
+        self._vectors[:, :n] = vectors[:, :n]
+        self._baselines[:, :n, :n] = baselines[:, :n, :n]
+
+    def _set_row(self, row, position, vector):
+        n = len(self)
+        self._positions[row] = position
+        self._vectors[:, row] = vector
+        self._baselines[:, row, :n] = vector[:, np.newaxis] - self._vectors[:, :n]
+        self._baselines[:, :n, row] = -self._baselines[:, row, :n]
+
+    def add(self, device_id, position):
+        """
+        Agrega un dispositivo con su posición geodésica (latitud, longitud, altitud).
+        """
+        if device_id in self._rows:
+            return self.move(device_id, position)
+        self._reserve(len(self) + 1)
+        row = len(self)
+        self._ids.append(device_id)
+        self._rows[device_id] = row
+        self._set_row(row, position, self._equatorial(position)[:, 0])
+
+    def move(self, device_id, position):
+        """
+        Actualiza la posición geodésica de un dispositivo.
+        """
+        self._set_row(self._rows[device_id], position, self._equatorial(position)[:, 0])
+
+    def remove(self, device_id):
+        """
+        Elimina un dispositivo. El último dispositivo pasa a ocupar su fila.
+        """
+        row = self._rows.pop(device_id)
+        last = len(self) - 1
+        moved = self._ids.pop()
+        if row != last:
+            self._ids[row] = moved
+            self._rows[moved] = row
+            self._positions[row] = self._positions[last]
+            self._vectors[:, row] = self._vectors[:, last]
+            self._baselines[:, row, :last] = self._baselines[:, last, :last]
+            self._baselines[:, :last, row] = self._baselines[:, :last, last]
+            self._baselines[:, row, row] = 0.
+
+    def rebuild(self, device_ids, geodetic_coords):
+        """
+        Recalcula la geometría completa de los dispositivos indicados.
+        """
+        geodetic_coords = np.asarray(geodetic_coords, dtype=np.float64).reshape(-1, 3)
+        n = len(device_ids)
+        self._reserve(n)
+        self._ids = list(device_ids)
+        self._rows = {device_id: row for row, device_id in enumerate(self._ids)}
+        self._positions[:n] = geodetic_coords
+        self._vectors[:, :n] = self._equatorial(geodetic_coords) if n else np.empty((3, 0))
+        vectors = self._vectors[:, :n]
+        self._baselines[:, :n, :n] = vectors[:, :, np.newaxis] - vectors[:, np.newaxis, :]
+
+    def sync(self, device_ids, geodetic_coords):
+        """
+        Actualiza la geometría para que contenga exactamente los dispositivos indicados en sus
+        posiciones, recalculando solo los que se agregaron, movieron o eliminaron.
+
+        device_ids: IDs de los dispositivos.
+        geodetic_coords: arreglo (N,3) con latitud, longitud y altitud de cada dispositivo.
+        """
+        geodetic_coords = np.asarray(geodetic_coords, dtype=np.float64).reshape(-1, 3)
+        current = set(device_ids)
+        removed = [device_id for device_id in self._ids if device_id not in current]
+        known = np.array([device_id in self._rows for device_id in device_ids], dtype=bool)
+        changed = ~known
+        if known.any():
+            rows = np.array([self._rows[device_id] for device_id in np.asarray(device_ids)[known].tolist()])
+            changed[known] = np.any(self._positions[rows] != geodetic_coords[known], axis=1)
+        if len(removed) + changed.sum() > self.REBUILD_FRACTION * max(len(device_ids), 1):
+            self.rebuild(device_ids, geodetic_coords)
+            return
+        for device_id in removed:
+            self.remove(device_id)
+        for index in np.flatnonzero(changed):
+            self.add(device_ids[index], geodetic_coords[index])
+
+    def baselines(self):
+        """
+        Retorna los baselines ecuatoriales (3, B) en el mismo formato de "baselines": con half
+        solo los pares i < j, en otro caso todos los pares i != j.
+        """
+        capacity = self._positions.shape[0]
+        index = _pair_index(len(self), capacity, self.half)
+        return self._baselines.reshape(3, capacity * capacity)[:, index]
+
+
+_group_geometries = None
+_group_geometries_lock = threading.Lock()
+
+
+def get_group_geometry(group_id, reference_location, half):
+    """
+    Retorna la GroupGeometry del grupo en el proceso. Si el punto de referencia o half cambiaron
+    se crea una nueva.
+    """
+    global _group_geometries
+    if _group_geometries is None:
+        with _group_geometries_lock:
+            if _group_geometries is None:
+                config = _geometry_config()
+                _group_geometries = LocalMemoryBackend(
+                    max_entries=config.get("MAX_GROUPS", 16), ttl=config.get("TIMEOUT", 600)
+                )
+    with _group_geometries_lock:
+        geometry = _group_geometries.get(group_id)
+        if (
+            geometry is None
+            or geometry.half != half
+            or not np.array_equal(geometry.reference, reference_location)
+        ):
+            geometry = GroupGeometry(reference_location, half)
+        # Se vuelve a guardar para renovar su antigüedad en la caché
+        _group_geometries.set(group_id, geometry)
+    return geometry
+
+
+_geometry_cache = None
+_geometry_cache_lock = threading.Lock()
+
+
+def _geometry_config():
+    return getattr(settings, "BASELINE_GEOMETRY_CACHE", {})
+
+
+def get_geometry_cache():
+    """
+    Retorna la caché de geometría del proceso, construida a partir de settings.BASELINE_GEOMETRY_CACHE.
+    """
+    global _geometry_cache
+    if _geometry_cache is None:
+        with _geometry_cache_lock:
+            if _geometry_cache is None:
+                config = _geometry_config()
+                _geometry_cache = LocalMemoryBackend(
+                    max_entries=config.get("MAX_ENTRIES", 64), ttl=config.get("TIMEOUT", 600)
+                )
+    return _geometry_cache
+
+
+def _compute_geometry(geodetic_coords, reference_location, half, group):
+    group_id, device_ids = group if group is not None else (None, None)
+    if device_ids is None:
+        return equatorial_baselines(geodetic_coords, reference_location, half)
+    geometry = get_group_geometry(group_id, reference_location, half)
+    with geometry.lock:
+        geometry.sync(device_ids, geodetic_coords)
+        return geometry.baselines()
+
+
+def baseline_geometry(geodetic_coords, reference_location, half=None, group=None):
+    """
+    Retorna los baselines ecuatoriales (3, B) de las posiciones, desde la caché si otras
+    posiciones a menos de TOLERANCE metros (por coordenada) ya se calcularon. Con TOLERANCE
+    igual a 0 no se usa la caché.
+
+    half: ver "baselines", por defecto settings.HERMITIAN_BASELINES.
+    group: ID del grupo e IDs de los dispositivos de geodetic_coords. Si se entrega, los
+    baselines se calculan de forma incremental con la GroupGeometry del grupo.
+    """
+    if half is None:
+        half = getattr(settings, "HERMITIAN_BASELINES", True)
+    tolerance = _geometry_config().get("TOLERANCE", 0.05)
+    if not tolerance:
+        return _compute_geometry(geodetic_coords, reference_location, half, group)
+
+    cache = get_geometry_cache()
+    key = geometry_key(geodetic_coords, reference_location, half, tolerance)
+    geometry = cache.get(key)
+    if geometry is None:
+        geometry = _compute_geometry(geodetic_coords, reference_location, half, group)
+        # Se comparte entre peticiones, no debe modificarse
+        geometry.setflags(write=False)
+        cache.set(key, geometry)
+    return geometry
@@ -0,0 +1,150 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SimulationJob
+
+"""
+Simulaciones del administrador en segundo plano.
+
+Con "?async=true" simuAdmin no espera la simulación: crea un SimulationJob, retorna su ID y la
+simulación se ejecuta en un pool de hilos del proceso. El estado y avance del trabajo se consultan
+en "simuadmin/jobs/<id>/". Si ya existe un trabajo pendiente con las mismas entradas (misma llave
+de caché) se retorna ese trabajo en lugar de crear otro.
+
+Los trabajos generan sus imagenes en hilos a la vez que las peticiones; los renderizadores de
+"render.py" no usan el estado global de pyplot, por lo que pueden ejecutarse en paralelo.
+
+Los trabajos activos que no se actualizan en settings.SIMULATION_JOBS["TIMEOUT"] segundos (por
+ejemplo, porque el proceso se reinició) se marcan como fallidos para que no bloqueen a los nuevos.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class InlineExecutor:
+
+    """
+    Ejecuta los trabajos inmediatamente en el hilo que los envía. Útil para pruebas y depuración.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+class ThreadExecutor(ThreadPoolExecutor):
+
+    """
+    Pool de hilos que cierra las conexiones a la base de datos del hilo antes y después de cada trabajo.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(self._run, fn, *args, **kwargs)
+
+    @staticmethod
+    def _run(fn, *args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _jobs_config():
+    return getattr(settings, "SIMULATION_JOBS", {})
+
+
+def get_executor():
+    """
+    Retorna el ejecutor de trabajos del proceso según settings.SIMULATION_JOBS["EXECUTOR"]:
+    "thread" (pool de WORKERS hilos) o "inline".
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = _jobs_config()
+                if config.get("EXECUTOR", "thread") == "inline":
+                    _executor = InlineExecutor()
+                else:
+                    _executor = ThreadExecutor(
+                        max_workers=config.get("WORKERS", 2), thread_name_prefix="simulation-job"
+                    )
+    return _executor
+
+
+def _update_job(job_id, **fields):
+    """
+    Actualiza un trabajo solo si sigue activo, ya que expire_stale_jobs pudo marcarlo como fallido
+    (y otro trabajo con la misma llave pudo comenzar). Retorna la cantidad de filas actualizadas.
+    """
+    # QuerySet.update no actualiza los campos auto_now
+    return SimulationJob.objects.filter(
+        pk=job_id, status__in=SimulationJob.ACTIVE_STATUSES
+    ).update(updated_at=timezone.now(), **fields)
+
+
+def expire_stale_jobs():
+    limit = timezone.now() - timedelta(seconds=_jobs_config().get("TIMEOUT", 600))
+    return SimulationJob.objects.filter(
+        status__in=SimulationJob.ACTIVE_STATUSES, updated_at__lt=limit
+    ).update(status=SimulationJob.FAILED, error="timeout", updated_at=timezone.now())
+
+
+def run_job(job_id, compute, publish):
+    """
+    Ejecuta un trabajo: compute(progress) calcula las imagenes informando el avance entre 0 y 1,
+    y publish(images) guarda y envía el resultado, retornando la instancia de Simulation.
+
+    Si el trabajo expiró mientras se calculaba, el resultado no se publica.
+    """
+    try:
+        _update_job(job_id, status=SimulationJob.RUNNING, progress=0.05)
+        images = compute(lambda value: _update_job(job_id, progress=0.05 + 0.85 * value))
+        if not _update_job(job_id, progress=0.95):
+            logger.warning("La simulación %s expiró antes de terminar, no se publica", job_id)
+            return
+        stored = publish(images)
+        if not _update_job(job_id, status=SimulationJob.DONE, progress=1.0, version=stored.version):
+            logger.warning("La simulación %s expiró mientras se publicaba", job_id)
+    except Exception as error:
+        logger.exception("Error en la simulación %s", job_id)
+        _update_job(job_id, status=SimulationJob.FAILED, error=str(error))
+
+
+def submit_simulation_job(group_id, key, compute, publish):
+    """
+    Crea un trabajo de simulación y lo envía al ejecutor, o retorna el trabajo activo del grupo con
+    la misma llave. La llave no incluye el grupo, por lo que dos grupos con las mismas entradas
+    tienen trabajos distintos y cada uno guarda y envía su resultado.
+
+    group_id: ID del grupo.
+    key: llave de caché de las entradas de la simulación.
+    compute, publish: ver run_job.
+
+    Retorna el trabajo y si fue creado.
+    """
+    expire_stale_jobs()
+    active = SimulationJob.objects.filter(
+        actual_group_id=group_id, key=key, status__in=SimulationJob.ACTIVE_STATUSES
+    )
+    job = active.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = SimulationJob.objects.create(key=key, actual_group_id=group_id)
+    except IntegrityError:
+        # Otra petición creó el mismo trabajo entre la consulta y la creación
+        return active.get(), False
+    get_executor().submit(run_job, job.id, compute, publish)
+    return job, True
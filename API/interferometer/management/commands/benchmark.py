@@ -0,0 +1,234 @@
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from interferometer.functions import (
+    SimulationResult, baselines, bENU_to_bEquatorial, calc_RR, compute_h, grid_sampling, uv_coverage
+)
+from interferometer.models import Device, Group
+from interferometer.render import FAST_RENDERERS, MATPLOTLIB_RENDERERS
+from interferometer.serializers import DeviceSerializer
+from interferometer.context import device_positions
+
+
+def measure(func, *args, **kwargs):
+    """
+    Ejecuta func y retorna su resultado, el tiempo en segundos y la memoria máxima asignada en bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def legacy_coverage(baselines, HA, dec, wavelength):
+    # Cálculo anterior de la cobertura, crea la matriz temporal 3x3xTxB
+    R_matrix = calc_RR(HA, dec)
+    uvw_dot = np.sum(R_matrix[..., np.newaxis] * baselines[np.newaxis, :, np.newaxis, :], axis=1)
+    return np.column_stack((uvw_dot[0].reshape(-1), uvw_dot[1].reshape(-1))) / wavelength
+
+
+def legacy_positions(id_group):
+    # Lectura anterior de las posiciones en simuGuest y simuAdmin
+    import pandas as pd
+
+    locations = Device.objects.filter(actual_group=id_group)
+    dvice = pd.DataFrame(DeviceSerializer(locations, many=True).data)
+    dvice = dvice.drop(
+        ["id", "device_id", "actual_group", "modified_at", "tokenFCM", "distance"], axis=1
+    )
+    return np.array(dvice).astype(float)
+
+
+def parse_importtime(output):
+    """
+    Lee la salida de "python -X importtime" y retorna un diccionario módulo -> (tiempo propio,
+    tiempo acumulado) en microsegundos.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = (int(self_us), int(cumulative))
+    return modules
+
+
+def import_times(module):
+    """
+    Importa el módulo en un intérprete nuevo, luego de django.setup(), y retorna el resultado de
+    parse_importtime.
+    """
+    code = f"import django; django.setup(); import {module}"
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(process.stderr)
+
+
+def random_array(devices, radius=200.0, seed=0):
+    # Posiciones ENU aleatorias de los dispositivos dentro de un radio en metros
+    rng = np.random.default_rng(seed)
+    enu = rng.uniform(-radius, radius, (3, devices))
+    enu[2] *= 0.01
+    return enu
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo y la memoria máxima de las etapas de la simulación con datos sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", choices=["coverage", "render", "positions", "devices", "imports"])
+        parser.add_argument("--devices", type=int, default=100, help="cantidad de dispositivos")
+        parser.add_argument("--observation-time", type=float, default=6, help="observationTime en horas (el ángulo horario va de -h a h)")
+        parser.add_argument("--sampling-time", type=float, default=10 / 60, help="samplingTime en minutos")
+        parser.add_argument("--declination", type=float, default=-30)
+        parser.add_argument("--chunk-size", type=int, default=256)
+        parser.add_argument("--legacy", action="store_true", help="también ejecuta el cálculo anterior")
+        parser.add_argument("--pixels", type=int, default=512, help="tamaño de la imagen modelo")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--groups", type=int, default=500, help="cantidad de grupos")
+        parser.add_argument("--module", default="interferometer.views", help="módulo a importar")
+        parser.add_argument("--top", type=int, default=15, help="cantidad de módulos del reporte")
+
+    def handle(self, *args, **options):
+        getattr(self, "benchmark_" + options["target"])(options)
+
+    def report(self, label, elapsed, peak):
+        self.stdout.write(f"{label:<28} {elapsed * 1000:>10.1f} ms {peak / 2**20:>12.1f} MiB")
+
+    def benchmark_coverage(self, options):
+        wavelength = 0.003
+        baseline_equatorial = bENU_to_bEquatorial(baselines(random_array(options["devices"])), -30)
+        HA, dec = compute_h(options["observation_time"], options["declination"], options["sampling_time"])
+        n_baselines = baseline_equatorial.shape[1]
+        self.stdout.write(f"dispositivos: {options['devices']}, baselines: {n_baselines}, ángulos horarios: {HA.size}")
+        self.stdout.write(f"matriz temporal del cálculo anterior: {9 * HA.size * n_baselines * 8 / 2**20:.1f} MiB")
+
+        for dtype in (np.float32, np.float64):
+            _, elapsed, peak = measure(
+                uv_coverage, baseline_equatorial, HA, dec, wavelength, options["chunk_size"], dtype
+            )
+            self.report(f"por bloques ({np.dtype(dtype).name})", elapsed, peak)
+
+        if options["legacy"]:
+            _, elapsed, peak = measure(legacy_coverage, baseline_equatorial, HA, dec, wavelength)
+            self.report("anterior (float64)", elapsed, peak)
+
+    def benchmark_render(self, options):
+        wavelength = 0.003
+        baseline_equatorial = bENU_to_bEquatorial(baselines(random_array(options["devices"]), half=True), -30)
+        HA, dec = compute_h(options["observation_time"], options["declination"], options["sampling_time"])
+        uv = uv_coverage(baseline_equatorial, HA, dec, wavelength, options["chunk_size"], np.float32, half=True)
+        max_B = np.max(np.abs(baseline_equatorial))
+        weights, psf = grid_sampling(options["pixels"], max_B, uv, wavelength, "natural", 0., hermitian=True)
+        dirty = np.random.default_rng(0).uniform(0, 255, (options["pixels"], options["pixels"]))
+        result = SimulationResult(uv, True, weights, psf, dirty)
+
+        for label, renderers in (("matplotlib", MATPLOTLIB_RENDERERS), ("fast", FAST_RENDERERS)):
+            for name, renderer in renderers.items():
+                renderer(result)
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    renderer(result)
+                elapsed = (time.perf_counter() - start) / options["repeat"]
+                self.stdout.write(f"{label + ' ' + name:<28} {elapsed * 1000:>10.1f} ms")
+
+    def benchmark_imports(self, options):
+        modules = import_times(options["module"])
+        total = sum(self_us for self_us, _ in modules.values())
+        self.stdout.write(f"{'total':<40} {total / 1000:>10.1f} ms")
+        # Paquetes de primer nivel ordenados por su tiempo acumulado
+        top_level = {name: times for name, times in modules.items() if "." not in name}
+        ranking = sorted(top_level.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (_, cumulative) in ranking[:options["top"]]:
+            self.stdout.write(f"{name:<40} {cumulative / 1000:>10.1f} ms")
+
+    def benchmark_positions(self, options):
+        # Los dispositivos se crean dentro de una transacción que se revierte al terminar
+        with transaction.atomic():
+            group = Group.objects.create(Group="benchmark-positions")
+            rng = np.random.default_rng(0)
+            Device.objects.bulk_create(
+                Device(
+                    device_id=str(i), tokenFCM=f"token{i}", actual_group=group,
+                    latitude=-33.45 + rng.uniform(-1e-3, 1e-3),
+                    longitude=-70.66 + rng.uniform(-1e-3, 1e-3),
+                    altitude=rng.uniform(0, 10),
+                )
+                for i in range(options["devices"])
+            )
+            self.stdout.write(f"dispositivos: {options['devices']}")
+            for label, func in (("values_list + fromiter", device_positions), ("serializer + pandas", legacy_positions)):
+                func(group.id)
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    func(group.id)
+                elapsed = (time.perf_counter() - start) / options["repeat"]
+                self.stdout.write(f"{label:<28} {elapsed * 1000:>10.2f} ms")
+            transaction.set_rollback(True)
+
+    def device_lookups(self, groups, devices, repeat):
+        # Consultas de DeviceViewSet.update y GroupRetrieveView sobre dispositivos al azar
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(devices), repeat)
+        start = time.perf_counter()
+        for i in picks:
+            Device.objects.get(actual_group=devices[i].actual_group_id, device_id=devices[i].device_id)
+        lookup = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for i in picks:
+            Device.objects.filter(actual_group=devices[i].actual_group_id).order_by("-modified_at").first()
+        latest = (time.perf_counter() - start) / repeat
+        return lookup, latest
+
+    def benchmark_devices(self, options):
+        # Los dispositivos se crean dentro de una transacción que se revierte al terminar. Para
+        # comparar, los índices de Device se eliminan dentro de la misma transacción.
+        repeat = max(options["repeat"], 200)
+        # SQLite solo permite modificar el esquema en una transacción sin revisión de llaves foráneas
+        constraint_checks = connection.vendor == "sqlite" and connection.disable_constraint_checking()
+        try:
+            self.devices_with_and_without_indexes(options, repeat)
+        finally:
+            if constraint_checks:
+                connection.enable_constraint_checking()
+
+    def devices_with_and_without_indexes(self, options, repeat):
+        with transaction.atomic():
+            groups = Group.objects.bulk_create(
+                Group(Group=f"benchmark-devices-{i}") for i in range(options["groups"])
+            )
+            devices = Device.objects.bulk_create(
+                Device(device_id=str(i), actual_group=groups[i % len(groups)], latitude=0.0, longitude=0.0, altitude=0.0)
+                for i in range(options["devices"])
+            )
+            devices = list(Device.objects.filter(actual_group__in=groups))
+            self.stdout.write(f"dispositivos: {len(devices)}, grupos: {len(groups)}, consultas: {repeat}")
+
+            lookup, latest = self.device_lookups(groups, devices, repeat)
+            self.stdout.write(f"{'con índices: get':<28} {lookup * 1000:>10.3f} ms")
+            self.stdout.write(f"{'con índices: último':<28} {latest * 1000:>10.3f} ms")
+
+            with connection.schema_editor() as editor:
+                for constraint in Device._meta.constraints:
+                    editor.remove_constraint(Device, constraint)
+                for index in Device._meta.indexes:
+                    editor.remove_index(Device, index)
+            lookup, latest = self.device_lookups(groups, devices, repeat)
+            self.stdout.write(f"{'sin índices: get':<28} {lookup * 1000:>10.3f} ms")
+            self.stdout.write(f"{'sin índices: último':<28} {latest * 1000:>10.3f} ms")
+            transaction.set_rollback(True)
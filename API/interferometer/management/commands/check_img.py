@@ -2,9 +2,10 @@ from django.core.management.base import BaseCommand
 from django.core.files import File
 import os
 from interferometer.models import Imagen
+from interferometer.spectra import write_sidecars, load_sidecars
 
 class Command (BaseCommand):
-    help = "Verifica si las imagenes modelo están subidas, en caso contrario las sube a la DB. Las imagenes se encuentran en el directorio \API\img"
+    help = "Verifica si las imagenes modelo están subidas, en caso contrario las sube a la DB. Las imagenes se encuentran en el directorio \API\img. También guarda los pixeles y espectro de cada imagen como .npy"
 
     def handle(self, *args, **kwargs):
         try:
@@ -17,9 +18,15 @@ class Command (BaseCommand):
                         image_path = os.path.join( "./img/", filename)
                         imagen = Imagen()
                         imagen.archivo.save(filename, File(open(image_path, 'rb')))
+                        write_sidecars(imagen.archivo.path)
                         self.stdout.write(self.style.SUCCESS(f'Imagen {filename} subida'))
 
             else:
+                # Se crean los .npy de las imagenes que aún no los tienen
+                for imagen in Imagen.objects.all():
+                    if imagen.archivo and os.path.exists(imagen.archivo.path) and load_sidecars(imagen.archivo.path) is None:
+                        write_sidecars(imagen.archivo.path)
+                        self.stdout.write(self.style.SUCCESS(f'Espectro de {imagen.archivo.name} guardado'))
                 self.stdout.write(self.style.SUCCESS('Todo está en orden en la tabla Imagen.'))
         
         except Exception as e:
@@ -0,0 +1,44 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+# Archivo de bloqueo compartido por todos los procesos de la máquina
+LOCK_PATH = os.path.join(tempfile.gettempdir(), "interferometer-deploy-checks.lock")
+
+
+@contextmanager
+def deploy_lock():
+    """
+    Bloqueo exclusivo entre los procesos de la máquina. En Windows (sin fcntl) no se bloquea, ya
+    que ahí solo se ejecuta en desarrollo y ambos comandos son idempotentes.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(LOCK_PATH, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta check_admin y check_img una sola vez a la vez, al desplegar o al iniciar gunicorn.'
+
+    def handle(self, *args, **kwargs):
+        # Falla (SystemCheckError) si la configuración no sirve en producción, ver "checks.py"
+        call_command('check', deploy=True, tags=['interferometer'], stdout=self.stdout, stderr=self.stderr)
+        # Si otro proceso está ejecutando las comprobaciones se espera a que termine; como
+        # ambos comandos son idempotentes la segunda ejecución no realiza cambios.
+        with deploy_lock():
+            call_command('check_admin', stdout=self.stdout, stderr=self.stderr)
+            call_command('check_img', stdout=self.stdout, stderr=self.stderr)
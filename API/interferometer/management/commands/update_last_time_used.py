@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from interferometer.models import Group, hours_since
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el campo last_time_used de todos los grupos en una sola actualización masiva.'
+
+    def handle(self, *args, **kwargs):
+        now = timezone.now()
+        groups = list(Group.objects.annotate(last_device_at=Max("device__modified_at")))
+        for group in groups:
+            group.last_time_used = hours_since(group.last_device_at, now)
+        Group.objects.bulk_update(groups, ["last_time_used"], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f'{len(groups)} grupos actualizados.'))
@@ -1,5 +1,17 @@
 from django.db import models
 
+# Horas desde el último uso que se asignan a los grupos sin dispositivos
+UNUSED_GROUP_HOURS = 100
+
+
+def hours_since(last_modified, now):
+    """
+    Retorna las horas transcurridas desde last_modified, o UNUSED_GROUP_HOURS si es None.
+    """
+    if last_modified is None:
+        return UNUSED_GROUP_HOURS
+    return (now - last_modified).total_seconds() / 3600
+
 
 class Device(models.Model):
     """
@@ -14,6 +26,9 @@ class Device(models.Model):
     actual_group: Campo llave foránea. Representa el ID del grupo asignado al dispositivo.
     modified_at: Campo de fecha. Representa la fecha y hora en la que fueron modificados los datos del dispositivo en la base de datos.
 
+    Un dispositivo solo puede estar una vez en cada grupo (unique_device_per_group). El índice
+    device_group_modified_idx sirve a las consultas por grupo ordenadas por la última modificación.
+
     """
     device_id = models.CharField(max_length=255, blank=True, null=True)
     tokenFCM = models.CharField(max_length=255, blank=True, null=True)
@@ -26,12 +41,24 @@ class Device(models.Model):
     )
     modified_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["actual_group", "device_id"], name="unique_device_per_group"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["actual_group", "-modified_at"], name="device_group_modified_idx"),
+        ]
+
 class Group(models.Model):
     """
     Modelo que representa la información de un grupo.
 
     group: Campo de string. Representa el nombre del grupo.
     last_time_used: Campo flotante. Representa el tiempo en horas de la última vez que fue utilizado.
+    Se actualiza periódicamente con el comando "update_last_time_used"; la API lo calcula al momento
+    a partir del último dispositivo modificado.
 
     """
     Group = models.CharField(unique=True, max_length=255)
@@ -88,4 +115,65 @@ class Parameters(models.Model):
     groupId = models.IntegerField(unique=True, blank=True, null=True)
     scale = models.FloatField(blank=True, null=True)
     scheme = models.CharField(blank=True, null=True)
-    robust_param= models.FloatField(blank=True, null = True)
\ No newline at end of file
+    robust_param= models.FloatField(blank=True, null = True)
+
+
+class Simulation(models.Model):
+
+    """
+    Modelo que representa el último resultado de simulación calculado por el administrador para un grupo.
+    Las imagenes resultantes se guardan en disco bajo MEDIA_ROOT/simulations/<grupo>/<versión>/ para que
+    sean servidas directamente por nginx.
+
+    actual_group: Campo llave foránea. Representa el grupo al cual pertenece el resultado.
+    version: Campo entero. Representa la versión del resultado, aumenta en uno con cada simulación del administrador.
+    created_at: Campo de fecha. Representa la fecha y hora en la que se guardó la versión actual.
+
+    """
+    actual_group = models.OneToOneField(
+        "Group", on_delete=models.CASCADE, related_name="simulation"
+    )
+    version = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now=True)
+
+
+class SimulationJob(models.Model):
+
+    """
+    Modelo que representa una simulación del administrador ejecutada en segundo plano (ver "jobs.py").
+
+    key: Campo de string. Representa la llave de caché de las entradas de la simulación, dos trabajos
+    pendientes del mismo grupo con la misma llave son la misma simulación (unique_active_simulation_job).
+    actual_group: Campo llave foránea. Representa el grupo simulado.
+    status: Campo de string. Representa el estado del trabajo: pending, running, done o failed.
+    progress: Campo flotante. Representa el avance del trabajo entre 0 y 1.
+    version: Campo entero. Representa la versión del resultado guardado (ver Simulation) al terminar.
+    error: Campo de string. Representa el error en caso de fallar.
+    created_at: Campo de fecha. Representa la fecha y hora de creación del trabajo.
+    updated_at: Campo de fecha. Representa la fecha y hora de la última actualización del trabajo.
+
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, PENDING), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED)]
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    key = models.CharField(max_length=64)
+    actual_group = models.ForeignKey("Group", on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.FloatField(default=0)
+    version = models.PositiveIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["actual_group", "key"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="unique_active_simulation_job",
+            ),
+        ]
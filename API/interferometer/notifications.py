@@ -0,0 +1,209 @@
+import logging
+import queue
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .context import invalidate_simulation_context
+from .models import Device
+
+"""
+Envío de notificaciones FCM fuera del hilo de la petición.
+
+simuAdmin solo agrega la notificación a una cola y un hilo en segundo plano (uno por proceso)
+la envía. FCM acepta a lo más 500 tokens por mensaje multicast, por lo que los tokens se envían
+en lotes de settings.FCM_NOTIFICATIONS["BATCH_SIZE"]. Los errores transitorios se reintentan con
+espera exponencial y los tokens que FCM reporta como no registrados se eliminan de Device.tokenFCM.
+
+firebase_admin se importa e inicializa (con settings.FIREBASE_CREDENTIALS) en el primer envío.
+"""
+
+logger = logging.getLogger(__name__)
+
+_firebase_lock = threading.Lock()
+
+
+def firebase_messaging():
+    """
+    Retorna el módulo firebase_admin.messaging, inicializando la app de Firebase si aún no existe.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+    with _firebase_lock:
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+    return messaging
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """
+    Errores de FCM que justifican reintentar el envío.
+    """
+    from firebase_admin import exceptions, messaging
+    return (
+        exceptions.UnavailableError,
+        exceptions.InternalError,
+        exceptions.DeadlineExceededError,
+        messaging.QuotaExceededError,
+    )
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def prune_tokens(tokens):
+    """
+    Elimina los tokens de los dispositivos que los tienen y retorna la cantidad de dispositivos modificados.
+    """
+    if not tokens:
+        return 0
+    devices = Device.objects.filter(tokenFCM__in=tokens)
+    group_ids = set(devices.values_list("actual_group_id", flat=True))
+    count = devices.update(tokenFCM=None)
+    # QuerySet.update no emite señales
+    invalidate_simulation_context(*group_ids)
+    return count
+
+
+class NotificationDispatcher:
+
+    """
+    Cola de notificaciones con un hilo que las envía en segundo plano.
+
+    client: módulo o cliente con MulticastMessage y send_each_for_multicast, por defecto
+    firebase_admin.messaging (ver "firebase_messaging").
+    batch_size: cantidad máxima de tokens por mensaje.
+    max_retries: cantidad de reintentos de un lote ante errores transitorios.
+    backoff: espera en segundos antes del primer reintento, se duplica en cada reintento.
+    queue_size: cantidad máxima de notificaciones en espera, las siguientes se descartan.
+    """
+
+    def __init__(self, client=None, batch_size=500, max_retries=3, backoff=1.0, queue_size=100):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, tokens, data):
+        """
+        Agrega una notificación a la cola. Retorna False si la cola está llena.
+        """
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return True
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((tokens, data))
+        except queue.Full:
+            logger.warning("Cola de notificaciones llena, se descarta el envío a %d tokens", len(tokens))
+            return False
+        return True
+
+    def join(self):
+        """
+        Espera a que se envíen todas las notificaciones de la cola.
+        """
+        self._queue.join()
+
+    def _ensure_worker(self):
+        # El hilo se crea en el primer envío, así cada proceso de gunicorn tiene el suyo
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="fcm-notifications", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            tokens, data = self._queue.get()
+            try:
+                close_old_connections()
+                self.send(tokens, data)
+            except Exception:
+                logger.exception("Error al enviar notificaciones")
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def send(self, tokens, data):
+        """
+        Envía la notificación a todos los tokens, en lotes, y elimina los tokens no registrados.
+
+        Retorna la cantidad de envíos exitosos y fallidos.
+        """
+        success, failure, unregistered = 0, 0, []
+        for batch in chunks(tokens, self.batch_size):
+            sent, failed = self._send_batch(batch, data, unregistered)
+            success += sent
+            failure += failed
+        pruned = prune_tokens(unregistered)
+        logger.info("enviadas: %d, fallidas: %d, tokens eliminados: %d", success, failure, pruned)
+        return success, failure
+
+    def _send_batch(self, tokens, data, unregistered):
+        from firebase_admin import messaging
+        if self.client is None:
+            self.client = firebase_messaging()
+        retryable = retryable_errors()
+        success, pending = 0, tokens
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            message = self.client.MulticastMessage(tokens=pending, data=data)
+            try:
+                response = self.client.send_each_for_multicast(message)
+            except retryable:
+                continue
+            retry = []
+            for token, result in zip(pending, response.responses):
+                if result.success:
+                    success += 1
+                elif isinstance(result.exception, messaging.UnregisteredError):
+                    unregistered.append(token)
+                elif isinstance(result.exception, retryable):
+                    retry.append(token)
+            pending = retry
+            if not pending:
+                break
+        return success, len(tokens) - success
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Retorna el despachador de notificaciones del proceso, construido a partir de settings.FCM_NOTIFICATIONS.
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                config = getattr(settings, "FCM_NOTIFICATIONS", {})
+                _dispatcher = NotificationDispatcher(
+                    batch_size=config.get("BATCH_SIZE", 500),
+                    max_retries=config.get("MAX_RETRIES", 3),
+                    backoff=config.get("BACKOFF", 1.0),
+                    queue_size=config.get("QUEUE_SIZE", 100),
+                )
+    return _dispatcher
+
+
+def send_notification(tokens, data):
+    """
+    Envía en segundo plano una notificación FCM con los datos indicados a los tokens.
+    """
+    return get_dispatcher().submit(list(tokens), data)
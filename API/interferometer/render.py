@@ -0,0 +1,234 @@
+import numpy as np
+import cv2
+from io import BytesIO
+from functools import lru_cache
+from django.conf import settings
+
+"""
+Generación de las imagenes de la simulación.
+
+La simulación (functions.simulation) solo entrega arreglos de NumPy. Las imagenes PNG se
+generan en esta etapa aparte y solo para las salidas que el cliente solicita, por ejemplo
+"?outputs=dirty,psf".
+
+Existen dos implementaciones de las imagenes, seleccionadas con settings.RENDERER:
+"matplotlib" (por defecto) genera las figuras originales con título y ejes; "fast" aplica el
+colormap con una tabla (LUT) de NumPy y codifica con cv2.imencode, sin figuras de matplotlib ni
+estado global de pyplot, a cambio de entregar las imagenes sin título ni ejes.
+
+matplotlib y cmcrameri se importan la primera vez que se usan (ver "_matplotlib" y "_cmaps"), de
+modo que importar este módulo (y las vistas) no paga su costo de importación. Las figuras se crean
+con matplotlib.figure.Figure y FigureCanvasAgg, sin pyplot, por lo que varios hilos pueden generar
+imagenes a la vez.
+"""
+
+# Nombre de las salidas en el orden en que se entregan por defecto
+OUTPUT_NAMES = ("dirty", "coverage", "sampling", "psf")
+
+# Tamaño en pixeles de la imagen de cobertura UV del renderizador rápido
+COVERAGE_SIZE = 512
+
+# Márgenes de la cobertura UV, igual que el autoescalado de matplotlib (5% por lado)
+COVERAGE_MARGIN = 0.05
+
+
+def parse_outputs(value):
+    """
+    value: nombres de las salidas separados por coma, o None para todas.
+    Retorna la tupla de salidas solicitadas. Lanza ValueError si alguna no existe.
+    """
+    if not value:
+        return OUTPUT_NAMES
+    outputs = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in outputs if name not in OUTPUT_NAMES]
+    if unknown or not outputs:
+        raise ValueError("Not known outputs: " + ", ".join(unknown))
+    return outputs
+
+
+@lru_cache(maxsize=None)
+def _matplotlib():
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    return Figure, FigureCanvasAgg
+
+
+def _cmaps():
+    import cmcrameri.cm as cmc
+    return cmc
+
+
+def _new_figure(title):
+    # Cada imagen usa su propia Figure sin pasar por pyplot, cuyo estado global (figura actual,
+    # plt.close('all')) es compartido entre los hilos de gthread y de los trabajos (ver "jobs.py")
+    Figure, FigureCanvasAgg = _matplotlib()
+    figure = Figure(figsize=(8, 8))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.set_title(title)
+    return figure, axes
+
+
+def _figure_to_png(figure):
+    buf = BytesIO()
+    figure.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def render_dirty(result):
+    boolean, buffer = cv2.imencode(".png", result.dirty)
+    return buffer.tobytes()
+
+
+def render_coverage(result):
+    uv = np.concatenate((result.uv, -result.uv)) if result.hermitian else result.uv
+    figure, axes = _new_figure("Cobertura UV")
+    axes.scatter(x=uv[:,0]/1000,y=uv[:,1]/1000, c="black", marker='.', s=0.4)
+    axes.set_xlabel(r'$u\ [k\lambda]$')  # Usa 'r' antes de la cadena de texto para que Python la trate como raw string
+    axes.set_ylabel(r'$v\ [k\lambda]$')
+    return _figure_to_png(figure)
+
+
+def render_sampling(result):
+    figure, axes = _new_figure('Cobertura cuadriculada')
+    axes.imshow(result.weights, cmap=_cmaps().tofino_r)
+    return _figure_to_png(figure)
+
+
+def render_psf(result):
+    figure, axes = _new_figure('Point Spread Function')
+    axes.imshow(result.psf, cmap=_cmaps().tofino_r, vmax=0.1)
+    return _figure_to_png(figure)
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(name):
+    """
+    Retorna la tabla de colores del colormap de cmcrameri como arreglo uint8 (N, 3) en orden BGR.
+    """
+    cmap = getattr(_cmaps(), name)
+    rgba = cmap(np.arange(cmap.N), bytes=True)
+    lut = np.ascontiguousarray(rgba[:, 2::-1])
+    lut.setflags(write=False)
+    return lut
+
+
+def colormap_png(array, cmap="tofino_r", vmin=None, vmax=None):
+    """
+    Aplica un colormap a un arreglo 2D y lo codifica como PNG, con la misma normalización
+    lineal de plt.imshow: los valores fuera de [vmin, vmax] toman el primer o último color.
+
+    array: arreglo 2D.
+    cmap: nombre del colormap en cmcrameri.cm.
+    vmin, vmax: límites de la normalización, por defecto el mínimo y máximo del arreglo.
+    """
+    lut = colormap_lut(cmap)
+    vmin = float(np.min(array)) if vmin is None else vmin
+    vmax = float(np.max(array)) if vmax is None else vmax
+    n = len(lut)
+    if vmax > vmin:
+        scaled = (np.asarray(array, dtype=np.float32) - vmin) * (n / (vmax - vmin))
+        index = np.clip(scaled, 0, n - 1, out=scaled).astype(np.intp)
+    else:
+        index = np.zeros(np.shape(array), dtype=np.intp)
+    boolean, buffer = cv2.imencode(".png", lut[index])
+    return buffer.tobytes()
+
+
+def _pixel_index(values, lower, upper, size, margin):
+    span = (upper - lower) or 1.0
+    lower = lower - margin * span
+    scale = (size - 1) / ((1 + 2 * margin) * span)
+    return np.rint((values - lower) * scale).astype(np.intp)
+
+
+def rasterize_uv(uv, size=COVERAGE_SIZE, margin=COVERAGE_MARGIN, mirror=False):
+    """
+    Dibuja los puntos uv en una imagen en escala de grises de size x size, fondo blanco y
+    puntos negros. Cada punto se acumula en el pixel que le corresponde, con u hacia la
+    derecha y v hacia arriba, y los límites se ajustan a los datos como en plt.scatter.
+
+    mirror: también dibuja los puntos -uv (baselines hermíticos) sin duplicar el arreglo.
+    """
+    canvas = np.full((size, size), 255, dtype=np.uint8)
+    if len(uv) == 0:
+        return canvas
+    u, v = uv[:, 0], uv[:, 1]
+    u_min, u_max, v_min, v_max = u.min(), u.max(), v.min(), v.max()
+    if mirror:
+        u_max = max(u_max, -u_min)
+        v_max = max(v_max, -v_min)
+        u_min, v_min = -u_max, -v_max
+    cols = _pixel_index(u, u_min, u_max, size, margin)
+    rows = (size - 1) - _pixel_index(v, v_min, v_max, size, margin)
+    hits = np.bincount(rows * size + cols, minlength=size * size).reshape(size, size) > 0
+    if mirror:
+        # Con límites simétricos el punto -uv cae en el pixel reflejado respecto al centro
+        hits |= hits[::-1, ::-1]
+    canvas[hits] = 0
+    return canvas
+
+
+def fast_render_coverage(result):
+    boolean, buffer = cv2.imencode(".png", rasterize_uv(result.uv, mirror=result.hermitian))
+    return buffer.tobytes()
+
+
+def fast_render_sampling(result):
+    return colormap_png(result.weights)
+
+
+def fast_render_psf(result):
+    return colormap_png(result.psf, vmax=0.1)
+
+
+MATPLOTLIB_RENDERERS = {
+    "dirty": render_dirty,
+    "coverage": render_coverage,
+    "sampling": render_sampling,
+    "psf": render_psf,
+}
+
+FAST_RENDERERS = {
+    "dirty": render_dirty,
+    "coverage": fast_render_coverage,
+    "sampling": fast_render_sampling,
+    "psf": fast_render_psf,
+}
+
+
+def get_renderers():
+    """
+    Retorna el diccionario nombre -> función de la implementación definida en settings.RENDERER.
+    """
+    if getattr(settings, "RENDERER", "matplotlib") == "fast":
+        return FAST_RENDERERS
+    return MATPLOTLIB_RENDERERS
+
+
+def render(result, outputs=OUTPUT_NAMES):
+    """
+    Genera las imagenes PNG de las salidas solicitadas. Retorna un diccionario nombre -> bytes.
+    """
+    renderers = get_renderers()
+    return {name: renderers[name](result) for name in outputs}
+
+
+def _compact(array):
+    # Los arreglos uint8 se entregan tal cual, el resto como float32
+    array = np.asarray(array)
+    return array if array.dtype == np.uint8 else array.astype(np.float32)
+
+
+def output_arrays(result, outputs=OUTPUT_NAMES):
+    """
+    Retorna los arreglos de las salidas solicitadas, sin generar imagenes, como un diccionario
+    nombre -> arreglo. La cobertura se entrega completa (M,2), incluyendo la mitad (-u, -v).
+    """
+    arrays = {
+        "dirty": lambda: result.dirty,
+        "coverage": lambda: np.concatenate((result.uv, -result.uv)) if result.hermitian else result.uv,
+        "sampling": lambda: result.weights,
+        "psf": lambda: result.psf,
+    }
+    return {name: _compact(arrays[name]()) for name in outputs}
@@ -0,0 +1,134 @@
+import struct
+import uuid
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+"""
+Formatos de respuesta de las vistas de simulación.
+
+Por defecto simuGuest y simuAdmin responden una lista JSON con las imagenes PNG en base64.
+Mediante el header "Accept" (o "?format=") el cliente puede pedir en su lugar:
+
+- "multipart/mixed" (?format=multipart): una parte por imagen con el PNG sin codificar.
+- "application/x-simulation-arrays" (?format=arrays): los arreglos de la simulación sin
+  generar imagenes, en el contenedor binario descrito en ArrayContainerRenderer.
+
+Las respuestas que no son imagenes (errores, "?urls=true") se entregan como JSON.
+"""
+
+ARRAYS_MAGIC = b"SIMA"
+ARRAYS_VERSION = 1
+
+
+def _is_payload(data):
+    # Las vistas entregan a estos renderers una lista de pares (nombre, contenido)
+    return isinstance(data, list) and all(isinstance(item, tuple) and len(item) == 2 for item in data)
+
+
+class _BinaryRenderer(BaseRenderer):
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        response = renderer_context.get("response")
+        if not _is_payload(data) or (response is not None and response.status_code >= 400):
+            if response is not None:
+                response["Content-Type"] = JSONRenderer.media_type
+            return JSONRenderer().render(data, JSONRenderer.media_type, renderer_context)
+        return self.render_payload(data, response)
+
+    def render_payload(self, data, response):
+        raise NotImplementedError
+
+
+class MultipartImageRenderer(_BinaryRenderer):
+
+    """
+    Entrega las imagenes como "multipart/mixed", una parte image/png por salida y en el orden
+    solicitado. El nombre de la salida va en el header Content-Disposition de cada parte.
+    """
+
+    media_type = "multipart/mixed"
+    format = "multipart"
+
+    def render_payload(self, data, response):
+        boundary = uuid.uuid4().hex
+        if response is not None:
+            response["Content-Type"] = f'{self.media_type}; boundary="{boundary}"'
+        body = []
+        for name, content in data:
+            body.append(
+                f"--{boundary}\r\n"
+                "Content-Type: image/png\r\n"
+                f'Content-Disposition: inline; name="{name}"; filename="{name}.png"\r\n'
+                f"Content-Length: {len(content)}\r\n\r\n".encode()
+            )
+            body.append(content)
+            body.append(b"\r\n")
+        body.append(f"--{boundary}--\r\n".encode())
+        return b"".join(body)
+
+
+class ArrayContainerRenderer(_BinaryRenderer):
+
+    """
+    Contenedor binario con los arreglos de la simulación (little-endian):
+
+    - Cabecera: "SIMA", versión (uint8) y cantidad de arreglos (uint8).
+    - Por arreglo: largo del nombre (uint8), nombre en UTF-8, largo del dtype (uint8), dtype de
+      NumPy (ej. "<f4", "|u1"), cantidad de dimensiones (uint8), dimensiones (uint32 cada una)
+      y finalmente los datos en orden C.
+    """
+
+    media_type = "application/x-simulation-arrays"
+    format = "arrays"
+
+    def render_payload(self, data, response):
+        body = [ARRAYS_MAGIC, struct.pack("<BB", ARRAYS_VERSION, len(data))]
+        for name, array in data:
+            array = np.ascontiguousarray(array)
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+            name = name.encode()
+            dtype = array.dtype.str.encode()
+            body.append(struct.pack("<B", len(name)) + name)
+            body.append(struct.pack("<B", len(dtype)) + dtype)
+            body.append(struct.pack(f"<B{array.ndim}I", array.ndim, *array.shape))
+            body.append(array.tobytes())
+        return b"".join(body)
+
+
+def decode_arrays(content):
+    """
+    Lee el contenedor de ArrayContainerRenderer y retorna un diccionario nombre -> arreglo.
+    """
+    if content[:4] != ARRAYS_MAGIC:
+        raise ValueError("Not a simulation arrays container")
+    version, count = struct.unpack_from("<BB", content, 4)
+    if version != ARRAYS_VERSION:
+        raise ValueError(f"Not supported version: {version}")
+    offset = 6
+    arrays = {}
+    for _ in range(count):
+        (length,) = struct.unpack_from("<B", content, offset)
+        name = content[offset + 1:offset + 1 + length].decode()
+        offset += 1 + length
+        (length,) = struct.unpack_from("<B", content, offset)
+        dtype = np.dtype(content[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+        (ndim,) = struct.unpack_from("<B", content, offset)
+        shape = struct.unpack_from(f"<{ndim}I", content, offset + 1)
+        offset += 1 + 4 * ndim
+        size = dtype.itemsize * int(np.prod(shape))
+        arrays[name] = np.frombuffer(content, dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        offset += size
+    return arrays
+
+
+# Renderers de simuGuest y simuAdmin, el primero (JSON) es el formato por defecto
+SIMULATION_RENDERERS = list(api_settings.DEFAULT_RENDERER_CLASSES) + [
+    MultipartImageRenderer,
+    ArrayContainerRenderer,
+]
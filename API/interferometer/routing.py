@@ -0,0 +1,7 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path("ws/simulation/<int:group_id>/", consumers.SimulationConsumer.as_asgi()),
+]
@@ -1,5 +1,8 @@
+import cv2
+import numpy as np
 from rest_framework import serializers
-from .models import Device, Admin, Group, RefPoint, Imagen, Parameters
+from django.utils import timezone
+from .models import Device, Admin, Group, RefPoint, Imagen, Parameters, SimulationJob, hours_since
 
 """
 Serializers: Serializers allow complex data such as querysets and model instances to be converted 
@@ -39,12 +42,56 @@ class DeviceSerializer(serializers.ModelSerializer):
         model = Device
         fields = '__all__'
 
+class DeviceUpsertSerializer(serializers.ModelSerializer):
+
+    """
+    Valida los datos de DeviceViewSet.update. No incluye el validador de unicidad de
+    (actual_group, device_id) ya que el dispositivo se crea o actualiza con update_or_create.
+    """
+
+    class Meta:
+        model = Device
+        fields = ["device_id", "actual_group", "tokenFCM", "latitude", "longitude", "altitude", "distance"]
+        validators = []
+
+class DevicePositionSerializer(serializers.Serializer):
+
+    """
+    Posición de un dispositivo dentro de una actualización masiva. timestamp es la fecha y hora en
+    la que el dispositivo obtuvo la posición; si no se envía se usa la hora de llegada. Si no se
+    envía altitude se conserva la altitud guardada del dispositivo.
+    """
+
+    device_id = serializers.CharField(max_length=255)
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    altitude = serializers.FloatField(required=False)
+    timestamp = serializers.DateTimeField(required=False)
+
+class BulkPositionSerializer(serializers.Serializer):
+    actual_group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+    positions = DevicePositionSerializer(many=True, allow_empty=False, max_length=1000)
+
 class AdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = Admin
         fields = '__all__'
 
 class GroupSerializer(serializers.ModelSerializer):
+
+    """
+    last_time_used se calcula a partir de la anotación "last_device_at" (fecha del último
+    dispositivo modificado, ver GroupRetrieveView) sin escribir en la base de datos. Si el
+    grupo no tiene la anotación se entrega el valor guardado.
+    """
+
+    last_time_used = serializers.SerializerMethodField()
+
+    def get_last_time_used(self, group):
+        if not hasattr(group, "last_device_at"):
+            return group.last_time_used
+        return hours_since(group.last_device_at, self.context.get("now") or timezone.now())
+
     class Meta:
         model = Group
         fields = '__all__'
@@ -59,6 +106,16 @@ class ImagenSerializer(serializers.ModelSerializer):
         model = Imagen
         fields = '__all__'
 
+    def validate_archivo(self, value):
+        # ImageField valida con Pillow, pero el espectro se calcula con OpenCV (ver "spectra.py"),
+        # que no lee todos los formatos de Pillow (por ejemplo ICO)
+        value.seek(0)
+        img = cv2.imdecode(np.frombuffer(value.read(), np.uint8), cv2.IMREAD_GRAYSCALE)
+        value.seek(0)
+        if img is None:
+            raise serializers.ValidationError("La imagen no se puede leer, use un formato como PNG o JPEG.")
+        return value
+
 class ParametersSerializer(serializers.ModelSerializer):
     class Meta:
         model = Parameters
@@ -66,4 +123,9 @@ class ParametersSerializer(serializers.ModelSerializer):
 
 class ParameterGroupSerializer(serializers.Serializer):
     actual_group = serializers.IntegerField()
-    parameter = ParametersSerializer()
\ No newline at end of file
+    parameter = ParametersSerializer()
+
+class SimulationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SimulationJob
+        fields = ["id", "actual_group", "status", "progress", "version", "error", "created_at", "updated_at"]
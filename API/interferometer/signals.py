@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .context import invalidate_simulation_context
+from .models import Device, Group, Imagen, Parameters, RefPoint
+
+"""
+Invalidación de la caché de entradas de la simulación (ver "context.py").
+
+Se registran en InterferometerConfig.ready (apps.py).
+"""
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+@receiver(post_save, sender=RefPoint)
+@receiver(post_delete, sender=RefPoint)
+def invalidate_group_context(sender, instance, **kwargs):
+    invalidate_simulation_context(instance.actual_group_id)
+
+
+@receiver(post_save, sender=Parameters)
+@receiver(post_delete, sender=Parameters)
+def invalidate_parameters_context(sender, instance, **kwargs):
+    invalidate_simulation_context(instance.groupId)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    invalidate_simulation_context(instance.pk)
+
+
+@receiver(post_save, sender=Imagen)
+@receiver(post_delete, sender=Imagen)
+def invalidate_image_context(sender, instance, **kwargs):
+    # La imagen modelo se referencia por ID desde los parametros de cada grupo
+    group_ids = Parameters.objects.filter(idPath=instance.pk).values_list("groupId", flat=True)
+    invalidate_simulation_context(*group_ids)
@@ -0,0 +1,176 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+"""
+Caché de espectros de las imagenes modelo.
+
+Las imagenes modelo (tabla Imagen) son pocas y casi nunca cambian, por lo tanto la imagen
+decodificada y su transformada de Fourier se guardan en memoria del proceso para no leer
+el archivo ni calcular la FFT en cada simulación. Las entradas se identifican por el ID de
+la imagen junto a la ruta, fecha de modificación y tamaño del archivo, de modo que un
+archivo reemplazado nunca entrega un espectro antiguo.
+
+Además, al subir una imagen se guardan junto al archivo los pixeles en escala de grises y
+el espectro como archivos .npy ("<archivo>.pixels.npy" y "<archivo>.spectrum.npy"). Estos
+se abren con np.load(mmap_mode='r'), por lo que todos los workers de gunicorn comparten las
+mismas páginas del page cache en lugar de tener cada uno su propia copia del espectro.
+"""
+
+PIXELS_SUFFIX = ".pixels.npy"
+SPECTRUM_SUFFIX = ".spectrum.npy"
+
+
+def compute_spectrum(path):
+    """
+    Lee la imagen modelo en escala de grises y calcula su espectro centrado.
+
+    Retorna la imagen y su transformada de Fourier (con fftshift aplicado).
+    """
+    img = cv2.imread(path, 0)
+    if img is None:
+        raise FileNotFoundError(path)
+    ft_data = np.fft.fftshift(np.fft.fft2(np.fft.ifftshift(img)))
+    return img, ft_data
+
+
+def sidecar_paths(path):
+    return path + PIXELS_SUFFIX, path + SPECTRUM_SUFFIX
+
+
+def _save_atomic(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(tmp_path, path)
+
+
+def write_sidecars(path):
+    """
+    Calcula la imagen en escala de grises y su espectro y los guarda como .npy junto a la imagen modelo.
+    """
+    img, ft_data = compute_spectrum(path)
+    pixels_path, spectrum_path = sidecar_paths(path)
+    _save_atomic(pixels_path, img)
+    _save_atomic(spectrum_path, ft_data)
+    return img, ft_data
+
+
+def load_sidecars(path):
+    """
+    Abre los .npy de la imagen modelo como arreglos de solo lectura mapeados en memoria.
+
+    Retorna None si no existen o si son más antiguos que la imagen.
+    """
+    pixels_path, spectrum_path = sidecar_paths(path)
+    try:
+        image_mtime = os.stat(path).st_mtime_ns
+        if min(os.stat(pixels_path).st_mtime_ns, os.stat(spectrum_path).st_mtime_ns) < image_mtime:
+            return None
+        return np.load(pixels_path, mmap_mode="r"), np.load(spectrum_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+
+def remove_sidecars(path):
+    for sidecar in sidecar_paths(path):
+        try:
+            os.remove(sidecar)
+        except FileNotFoundError:
+            pass
+
+
+def _load(path):
+    """
+    Obtiene la imagen y su espectro desde los .npy mapeados en memoria. Si no existen se crean,
+    y si no es posible escribirlos se calculan en memoria del proceso.
+    """
+    arrays = load_sidecars(path)
+    if arrays is not None:
+        return arrays
+    try:
+        write_sidecars(path)
+    except OSError:
+        return compute_spectrum(path)
+    arrays = load_sidecars(path)
+    return arrays if arrays is not None else compute_spectrum(path)
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+class SpectrumCache:
+    """
+    Caché LRU de (imagen, espectro) con un presupuesto de memoria en bytes. Solo se
+    contabilizan los arreglos en memoria del proceso, no los mapeados desde los .npy.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_id, path):
+        stamp = _file_stamp(path)
+        with self._lock:
+            entry = self._entries.get(image_id)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(image_id)
+                return entry[1], entry[2]
+
+        img, ft_data = _load(path)
+        img.setflags(write=False)
+        ft_data.setflags(write=False)
+        self._insert(image_id, stamp, img, ft_data)
+        return img, ft_data
+
+    def _insert(self, image_id, stamp, img, ft_data):
+        # Los arreglos mapeados en memoria no ocupan memoria propia del proceso
+        size = sum(a.nbytes for a in (img, ft_data) if not isinstance(a, np.memmap))
+        with self._lock:
+            self._pop(image_id)
+            if size > self.max_bytes:
+                return
+            self._entries[image_id] = (stamp, img, ft_data, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, _, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def _pop(self, image_id):
+        entry = self._entries.pop(image_id, None)
+        if entry is not None:
+            self.current_bytes -= entry[3]
+
+    def invalidate(self, image_id):
+        with self._lock:
+            self._pop(image_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+_spectrum_cache = None
+_spectrum_cache_lock = threading.Lock()
+
+
+def get_spectrum_cache():
+    """
+    Retorna la caché de espectros del proceso, construida a partir de settings.MODEL_IMAGE_CACHE.
+    """
+    global _spectrum_cache
+    if _spectrum_cache is None:
+        with _spectrum_cache_lock:
+            if _spectrum_cache is None:
+                config = getattr(settings, "MODEL_IMAGE_CACHE", {})
+                _spectrum_cache = SpectrumCache(config.get("MAX_BYTES", 256 * 1024 * 1024))
+    return _spectrum_cache
@@ -0,0 +1,57 @@
+import importlib
+
+from django.db import connections
+
+"""
+Preparación de los procesos que atienden peticiones.
+
+Las vistas importan matplotlib, cmcrameri, astropy y firebase_admin recién cuando los usan, por
+lo que un comando de manage.py no paga su costo de importación. En producción gunicorn los
+importa una sola vez en el proceso maestro antes del fork (preload_modules, ver
+"gunicorn_config.py"), y los workers comparten esas páginas de memoria (copy-on-write).
+Luego del fork cada worker precarga sus cachés (warm_caches).
+"""
+
+# Módulos pesados que se importan antes del fork
+PRELOAD_MODULES = (
+    "numpy",
+    "cv2",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "cmcrameri.cm",
+    "astropy.coordinates",
+    "firebase_admin.messaging",
+)
+
+
+def preload_modules():
+    """
+    Importa los módulos pesados y las vistas (a través de las URL del proyecto).
+    """
+    import matplotlib
+    matplotlib.use("agg")
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def warm_caches():
+    """
+    Carga en la caché de espectros del proceso las imagenes modelo y la tabla del colormap.
+    """
+    from .models import Imagen
+    from .render import colormap_lut
+    from .spectra import get_spectrum_cache
+
+    colormap_lut("tofino_r")
+    cache = get_spectrum_cache()
+    try:
+        for image in Imagen.objects.all():
+            try:
+                cache.get(image.id, image.archivo.path)
+            except (OSError, ValueError, AttributeError):
+                continue
+    finally:
+        # El worker no conserva la conexión abierta durante la precarga
+        connections.close_all()
@@ -1,5 +1,7 @@
-from django.test import TestCase
-from .models import Device, Group, Admin, RefPoint, Imagen, Parameters
+from django.test import TestCase, override_settings
+from .models import Device, Group, Admin, RefPoint, Imagen, Parameters, Simulation, SimulationJob
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase
@@ -8,9 +10,43 @@ from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from unittest.mock import patch
+from types import SimpleNamespace
+from firebase_admin import exceptions, messaging
+from .notifications import NotificationDispatcher
+from .management.commands.benchmark import import_times, parse_importtime
+from .geometry import GroupGeometry, baseline_geometry, get_geometry_cache, quantize_positions
+from .executor import ExecutorBusy, SimulationExecutor, from_shared_memory, to_shared_memory
+from .jobs import InlineExecutor, ThreadExecutor, run_job, submit_simulation_job
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from API.asgi import application
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.db import IntegrityError, transaction
+from io import BytesIO, StringIO
 from .functions import *
+from astropy.coordinates import EarthLocation
+from .cache import simulation_key, LocalMemoryBackend, DjangoCacheBackend, ResultCache
+from .artifacts import artifact_path, artifact_url
+from .renderers import decode_arrays
+from .context import device_positions, load_simulation_context, fetch_simulation_context
+from .render import OUTPUT_NAMES, colormap_png, parse_outputs, rasterize_uv, render
+from .spectra import SpectrumCache, compute_spectrum, write_sidecars, load_sidecars, sidecar_paths
+import base64
+import email
+import os
+import shutil
+import tempfile
+import cv2
+from PIL import Image as PILImage
+import threading
+import time
 import unittest
 
+# Imagen modelo de las pruebas, las que guardan archivos usan un MEDIA_ROOT temporal
+MODEL_IMAGE = os.path.join(settings.MEDIA_ROOT, "img", "cat.png")
+
 
 class DeviceModelTestCase(TestCase):
     def setUp(self):
@@ -92,11 +128,12 @@ class RefPointModelTestCase(TestCase):
         self.assertEqual(ref_point.altitude, 30.0)
         self.assertEqual(ref_point.actual_group, self.group)
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ImagenModelTestCase(TestCase):
     def setUp(self):
         self.image = SimpleUploadedFile(
             name="test_image_MODEL_.png",
-            content=open("./media/img/cat.png", "rb").read(),
+            content=open(MODEL_IMAGE, "rb").read(),
             content_type="image/png",
         )
 
@@ -113,6 +150,7 @@ class ImagenModelTestCase(TestCase):
             self.image.close()
         except:
             pass
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
 
 class ParametersModelTestCase(TestCase):
     def test_parameters_creation(self):
@@ -190,11 +228,12 @@ class ParametersViewSetTestCase(APITestCase):
     def tearDown(self):
         pass
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class ImagenViewSetTestCase(APITestCase):
     def setUp(self):
         self.image_file = SimpleUploadedFile(
             name="test_image_viewset2_.png",
-            content=open("./media/img/cat.png", "rb").read(),
+            content=open(MODEL_IMAGE, "rb").read(),
             content_type="image/png",
         )
         self.imagen = Imagen.objects.create(archivo=self.image_file)
@@ -205,7 +244,7 @@ class ImagenViewSetTestCase(APITestCase):
         data = {
             "archivo": SimpleUploadedFile(
                 name="test_image_viewset2_.png",
-                content=open("./media/img/cat.png", "rb").read(),
+                content=open(MODEL_IMAGE, "rb").read(),
                 content_type="image/png",
             )
         }
@@ -213,6 +252,19 @@ class ImagenViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Imagen.objects.count(), 2)
 
+    def test_create_image_unreadable_by_opencv(self):
+        # Pillow acepta ICO pero OpenCV no lo puede leer, no debe quedar la fila ni el archivo
+        icon = BytesIO()
+        PILImage.new("L", (4, 4)).save(icon, format="ICO")
+        files_before = set(os.listdir(settings.MEDIA_ROOT))
+        url = reverse("imagen-list")
+        data = {"archivo": SimpleUploadedFile(name="test_image.ico", content=icon.getvalue(), content_type="image/x-icon")}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("archivo", response.data)
+        self.assertEqual(Imagen.objects.count(), 1)
+        self.assertEqual(set(os.listdir(settings.MEDIA_ROOT)), files_before)
+
     def test_get_image_list(self):
         # Prueba obtener una lista de Imagenes
         url = reverse("imagen-list")
@@ -226,19 +278,26 @@ class ImagenViewSetTestCase(APITestCase):
         data = {
             "archivo": SimpleUploadedFile(
                 name="test_image_viewset_RE_.png",
-                content=open("./media/img/cat.png", "rb").read(),
+                content=open(MODEL_IMAGE, "rb").read(),
                 content_type="image/png",
             )
         }
+        old_sidecars = sidecar_paths(self.imagen.archivo.path)
+        write_sidecars(self.imagen.archivo.path)
         response = self.client.put(url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(os.path.exists(sidecar) for sidecar in old_sidecars))
+        new_path = Imagen.objects.get(id=self.imagen.id).archivo.path
+        self.assertTrue(all(os.path.exists(sidecar) for sidecar in sidecar_paths(new_path)))
 
     def test_delete_image(self):
         # Prueba borrar una Imagen
         url = reverse("imagen-detail", args=[self.imagen.id])
+        write_sidecars(self.imagen.archivo.path)
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Imagen.objects.exists())
+        self.assertFalse(any(os.path.exists(sidecar) for sidecar in sidecar_paths(self.imagen.archivo.path)))
 
     def tearDown(self):
         self.imagen.archivo.delete(save=False)
@@ -369,9 +428,56 @@ class GroupRetrieveViewTestCase(APITestCase):
             expected_last_time_used = 100 if group.device_set.first() is None else (timezone.now() - group.device_set.first().modified_at).total_seconds() / 3600
             self.assertAlmostEqual(group_data['last_time_used'], expected_last_time_used, places=2)
 
+    def test_get_groups_does_not_write(self):
+        Group.objects.create(Group='Grupo C')
+        url = reverse('group-list')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual([g['last_time_used'] for g in response.data if g['Group'] == 'Grupo C'], [100])
+        self.assertFalse(Group.objects.filter(last_time_used__isnull=False).exists())
+
+    def test_update_last_time_used_command(self):
+        Device.objects.filter(id=self.device1.id).update(modified_at=timezone.now() - timedelta(hours=2))
+        call_command('update_last_time_used', stdout=StringIO())
+        self.assertAlmostEqual(Group.objects.get(id=self.group1.id).last_time_used, 2, places=2)
+        self.assertAlmostEqual(Group.objects.get(id=self.group2.id).last_time_used, 0, places=2)
+
     def tearDown(self):
         pass
 
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}},
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class DeployChecksTestCase(TestCase):
+
+    def test_in_memory_channel_layer_fails(self):
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+            with self.assertRaises(SystemCheckError):
+                call_command('deploy_checks', stdout=StringIO(), stderr=StringIO())
+            with override_settings(DEBUG=True):
+                call_command('deploy_checks', stdout=StringIO())
+
+    def test_deploy_checks_are_idempotent(self):
+        Imagen.objects.create()
+        self.assertNotIn('interferometer.middlewares.CheckUserAdminMiddleware', settings.MIDDLEWARE)
+        call_command('deploy_checks', stdout=StringIO())
+        call_command('deploy_checks', stdout=StringIO())
+        self.assertEqual(User.objects.filter(is_superuser=True).count(), 1)
+        self.assertEqual(Imagen.objects.count(), 1)
+
+    def test_deploy_checks_without_fcntl(self):
+        # Windows no tiene fcntl, las comprobaciones se ejecutan sin bloqueo
+        with patch('interferometer.management.commands.deploy_checks.fcntl', None):
+            call_command('deploy_checks', stdout=StringIO())
+        self.assertEqual(User.objects.filter(is_superuser=True).count(), 1)
+
+    def tearDown(self):
+        # check_img sube las imagenes modelo a MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+
 class DeviceViewSetTestCase(APITestCase):
 
     def setUp(self):
@@ -396,6 +502,66 @@ class DeviceViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.device1.refresh_from_db()
 
+    def test_update_device_upsert(self):
+        url = reverse('register-detail', args=[self.device1.id])
+        data = {'device_id': '3', 'actual_group': self.group1.id, 'latitude': 1.5}
+        response = self.client.put(url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        modified_at = Device.objects.get(device_id='3').modified_at
+
+        data['latitude'] = 2.5
+        response = self.client.put(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        device = Device.objects.get(device_id='3', actual_group=self.group1)
+        self.assertEqual(device.latitude, 2.5)
+        self.assertGreater(device.modified_at, modified_at)
+
+        data['actual_group'] = self.group2.id + 100
+        response = self.client.put(url, data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_positions(self):
+        Device.objects.create(device_id='3', actual_group=self.group1)
+        Device.objects.filter(device_id='1').update(modified_at=timezone.now() - timedelta(minutes=5))
+        load_simulation_context(self.group1.id)
+        data = {
+            'actual_group': self.group1.id,
+            'positions': [
+                {'device_id': '1', 'latitude': 1.0, 'longitude': 2.0, 'altitude': 3.0,
+                 'timestamp': (timezone.now() - timedelta(minutes=2)).isoformat()},
+                {'device_id': '1', 'latitude': 9.0, 'longitude': 9.0,
+                 'timestamp': (timezone.now() - timedelta(minutes=3)).isoformat()},
+                {'device_id': '3', 'latitude': 4.0, 'longitude': 5.0,
+                 'timestamp': (timezone.now() - timedelta(hours=1)).isoformat()},
+                {'device_id': '2', 'latitude': 4.0, 'longitude': 5.0},
+            ],
+        }
+        response = self.client.post(reverse('register-bulk_positions'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 1, 'stale': ['3'], 'not_found': ['2']})
+
+        self.device1.refresh_from_db()
+        self.assertEqual((self.device1.latitude, self.device1.longitude, self.device1.altitude), (1.0, 2.0, 3.0))
+        self.assertIsNone(Device.objects.get(device_id='3').latitude)
+        self.assertIsNone(Device.objects.get(device_id='2').latitude)
+        np.testing.assert_array_equal(load_simulation_context(self.group1.id).positions, [[1.0, 2.0, 3.0]])
+
+        # Sin altitude se conserva la altitud guardada
+        data = {'actual_group': self.group1.id, 'positions': [{'device_id': '1', 'latitude': 1.5, 'longitude': 2.5}]}
+        response = self.client.post(reverse('register-bulk_positions'), data, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.device1.refresh_from_db()
+        self.assertEqual((self.device1.latitude, self.device1.longitude, self.device1.altitude), (1.5, 2.5, 3.0))
+
+        response = self.client.post(reverse('register-bulk_positions'), {'actual_group': self.group1.id, 'positions': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_device_unique_per_group(self):
+        Device.objects.create(device_id='1', actual_group=self.group2)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Device.objects.create(device_id='1', actual_group=self.group1)
+
     def test_delete_devices_by_group(self):
         # Prueba eliminar dispositivos por grupo
         url = reverse('register-delete_by_group') + '?actual_group=' + str(self.group1.id)
@@ -429,12 +595,13 @@ class MessageViewTestCase(APITestCase):
     def tearDown(self):
         pass
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class DoSimulationTestCase(APITestCase):
 
     def setUp(self):
         self.image_file = SimpleUploadedFile(
             name='test_image_SIM_.png',
-            content=open("./media/img/cat.png", 'rb').read(),
+            content=open(MODEL_IMAGE, 'rb').read(),
             content_type='image/png'
         )
         self.imagen = Imagen.objects.create(archivo=self.image_file)
@@ -461,6 +628,7 @@ class DoSimulationTestCase(APITestCase):
 
     def tearDown(self):
         self.imagen.archivo.delete(save=False)
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
 
 class TestCalcRR(unittest.TestCase):
 
@@ -624,7 +792,7 @@ class TestCoverage(unittest.TestCase):
         expected_output = np.array([[ 5326.7753202 , -1909.25118752],
                                     [-5326.7753202 ,  1909.25118752]])
         
-        result, _ = coverage(self.base_equ, self.H, self.dec, self.wavelength)
+        result = coverage(self.base_equ, self.H, self.dec, self.wavelength)
 
         np.testing.assert_array_almost_equal(result, expected_output)
 
@@ -639,23 +807,911 @@ class TestGridSampling(unittest.TestCase):
     
     def test_grid_sampling(self):
 
-        expected_output = np.array([[0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 1.+0.j, 0.+0.j, 1.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j],
-                                    [0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j, 0.+0.j,0.+0.j, 0.+0.j]])
-        
-        result, _ ,_ = grid_sampling(self.pixel, self.max_base_equ,self.coverage,self.wavelength)
+        # Las muestras (u, v) y (-u, -v) caen en las celdas (fila v, columna u) [4, 5] y [5, 4]
+        expected_output = np.zeros((self.pixel, self.pixel))
+        expected_output[4, 5] = 1.
+        expected_output[5, 4] = 1.
+
+        result, _ = grid_sampling(self.pixel, self.max_base_equ,self.coverage,self.wavelength, "natural", 2.)
 
         np.testing.assert_array_almost_equal(result, expected_output)
 
 
+class TestIncrementalGridder(unittest.TestCase):
 
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.uv = rng.normal(size=(5000, 2)) * 3000
+        self.delta_u = uv_cell_size(64, 30, 0.003)
+
+    def test_weights_match_weighting_scheme(self):
+        gridder = IncrementalGridder(64, self.delta_u)
+        gridder.add(self.uv)
+        u_pixel = np.floor(self.uv[:, 0] / self.delta_u + 32).astype(int)
+        v_pixel = np.floor(self.uv[:, 1] / self.delta_u + 32).astype(int)
+        uv_pix_1d = 64 * v_pixel + u_pixel
+        for scheme in ("natural", "uniform", "robust"):
+            weights = weighting_scheme(np.ones(len(self.uv), dtype=np.float32), uv_pix_1d, 64, scheme, 0.5)
+            expected = np.bincount(uv_pix_1d, weights, minlength=64 * 64).reshape(64, 64)
+            np.testing.assert_allclose(gridder.weights(scheme, 0.5), expected, rtol=1e-9)
+
+    def test_add_and_remove_samples(self):
+        gridder = IncrementalGridder(64, self.delta_u, hermitian=True)
+        gridder.add(self.uv)
+        moved = self.uv[:10] * 1.1
+        gridder.remove(self.uv[:10])
+        gridder.add(moved)
+        expected = IncrementalGridder(64, self.delta_u, hermitian=True)
+        expected.add(np.concatenate((moved, self.uv[10:])))
+        np.testing.assert_array_equal(gridder.counts, expected.counts)
+        self.assertEqual(gridder.counts.sum(), 2 * len(self.uv))
+
+
+class TestStreamingSampling(unittest.TestCase):
 
+    def setUp(self):
+        positions = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0],
+                              [-41.463700, -72.920500, 5.0], [-41.465100, -72.918900, 2.0]])
+        self.reference = np.array([-41.463874, -72.920166, 0.0])
+        self.positions = positions
+        self.wavelength = const_c / 90e9
+
+    def full_sampling(self, baselines, half, scheme):
+        HA, dec = compute_h(4, 40, 1)
+        uv = coverage(baselines, HA, dec, self.wavelength, dtype=np.float32, half=half)
+        return uv, grid_sampling(64, np.max(np.abs(baselines)), uv, self.wavelength, scheme, 0.5, hermitian=half)
+
+    def test_hour_angle_blocks_match_compute_h(self):
+        HA, _ = compute_h(4, 40, 1)
+        blocks = list(hour_angle_blocks(4, 1, block_size=50))
+        self.assertTrue(all(len(block) <= 50 for block in blocks))
+        np.testing.assert_array_equal(np.concatenate(blocks), HA)
+
+    def test_matches_full_coverage(self):
+        for half in (True, False):
+            baselines = equatorial_baselines(self.positions, self.reference, half)
+            for scheme in ("natural", "robust"):
+                uv, (weights, psf) = self.full_sampling(baselines, half, scheme)
+                subset, hermitian, stream_weights, stream_psf = streaming_sampling(
+                    64, np.max(np.abs(baselines)), baselines, 4, 40, 1, self.wavelength, scheme, 0.5,
+                    half=half, block_size=7, max_points=100,
+                )
+                self.assertTrue(hermitian)
+                np.testing.assert_allclose(stream_weights, weights, rtol=1e-12)
+                np.testing.assert_allclose(stream_psf, psf, rtol=1e-9, atol=1e-12)
+                self.assertLessEqual(len(subset), 100)
+
+    def test_simulation_uses_streaming_above_threshold(self):
+        baselines = equatorial_baselines(self.positions, self.reference, True)
+        with patch("interferometer.functions.fft_model_image", return_value=(64, np.ones((64, 64)))):
+            full = simulation(4, 40, 1, None, self.positions, self.reference, 90, "natural", 0.0,
+                              baseline_equatorial=baselines)
+            with override_settings(SIMULATION_STREAMING={"MIN_SAMPLES": 0, "MAX_COVERAGE_POINTS": 50}):
+                streamed = simulation(4, 40, 1, None, self.positions, self.reference, 90, "natural", 0.0,
+                                      baseline_equatorial=baselines)
+        np.testing.assert_allclose(streamed.weights, full.weights)
+        np.testing.assert_allclose(streamed.dirty, full.dirty, atol=1e-9)
+        self.assertLessEqual(len(streamed.uv), 50)
+        self.assertEqual(len(full.uv), 480 * 6)
+
+
+class TestSimulationKey(unittest.TestCase):
 
+    def setUp(self):
+        self.positions = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0]])
+        self.reference = np.array([-41.463874, -72.920166, 0.0])
+        self.parameters = {"observationTime": 2, "declination": 40, "samplingTime": 6, "frequency": 90,
+                           "idPath": 1, "scale": 1.0, "scheme": "natural", "robust_param": 0.0, "id": 7}
+
+    def test_same_inputs_same_key(self):
+        key1 = simulation_key(self.positions, self.reference, self.parameters, 1)
+        key2 = simulation_key(self.positions.copy(), self.reference.copy(), dict(self.parameters, id=8), 1)
+        self.assertEqual(key1, key2)
+
+    def test_different_inputs_different_key(self):
+        key = simulation_key(self.positions, self.reference, self.parameters, 1)
+        moved = self.positions.copy()
+        moved[0, 0] += 1e-6
+        self.assertNotEqual(key, simulation_key(moved, self.reference, self.parameters, 1))
+        self.assertNotEqual(key, simulation_key(self.positions, self.reference, dict(self.parameters, frequency=100), 1))
+        self.assertNotEqual(key, simulation_key(self.positions, self.reference, self.parameters, 2))
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        backend = LocalMemoryBackend(max_entries=2, ttl=None)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("c"), 3)
+
+    def test_ttl_expiration(self):
+        backend = LocalMemoryBackend(max_entries=2, ttl=10)
+        with patch("interferometer.cache.time.monotonic", return_value=100.0):
+            backend.set("a", 1)
+        with patch("interferometer.cache.time.monotonic", return_value=105.0):
+            self.assertEqual(backend.get("a"), 1)
+        with patch("interferometer.cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(backend.get("a"))
+
+    def test_concurrent_requests_compute_once(self):
+        result_cache = ResultCache(LocalMemoryBackend())
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "resultado"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(result_cache.get_or_compute("k", compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["resultado"] * 8)
+
+    def test_django_backend(self):
+        result_cache = ResultCache(DjangoCacheBackend(prefix="test-simulation"))
+        self.assertEqual(result_cache.get_or_compute("k", lambda: [1, 2]), [1, 2])
+        self.assertEqual(result_cache.get_or_compute("k", lambda: [3]), [1, 2])
+        result_cache.invalidate("k")
+        self.assertEqual(result_cache.get_or_compute("k", lambda: [3]), [3])
+
+    def test_django_backend_clear_keeps_other_entries(self):
+        backend = DjangoCacheBackend(prefix="test-clear")
+        cache.set("test-context", 1)
+        backend.set("k", [1])
+        backend.clear()
+        self.assertIsNone(backend.get("k"))
+        self.assertEqual(cache.get("test-context"), 1)
+        backend.set("k", [2])
+        self.assertEqual(backend.get("k"), [2])
+        cache.delete("test-context")
+
+    def test_django_backend_clear_releases_lock(self):
+        backend = DjangoCacheBackend(prefix="test-lock")
+        self.assertTrue(backend.acquire("k"))
+        backend.clear()
+        backend.release("k")
+        self.assertFalse(backend.is_locked("k"))
+        self.assertTrue(backend.acquire("k"))
+        backend.release("k")
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StoredSimulationTestCase(APITestCase):
 
+    def setUp(self):
+        self.group = Group.objects.create(Group='Grupo A')
+        self.image_file = SimpleUploadedFile(
+            name='test_image_STORED_.png',
+            content=open(MODEL_IMAGE, 'rb').read(),
+            content_type='image/png'
+        )
+        self.imagen = Imagen.objects.create(archivo=self.image_file)
+        RefPoint.objects.create(latitude=-41.463874, longitude=-72.920166, altitude=0.0, actual_group=self.group)
+        Device.objects.create(device_id='1', tokenFCM='token1', latitude=-41.464183, longitude=-72.919694, altitude=0.0, actual_group=self.group)
+        Device.objects.create(device_id='2', tokenFCM='token2', latitude=-41.464507, longitude=-72.919898, altitude=0.0, actual_group=self.group)
+        self.data = {
+            "actual_group": self.group.id,
+            "parameter": {
+                "idPath": self.imagen.id,
+                "scale": 1.0,
+                "observationTime": 2,
+                "declination": 40,
+                "samplingTime": 6,
+                "frequency": 90,
+                "scheme": "natural",
+                "robust_param": 0.0,
+            }
+        }
+
+    @patch('interferometer.views.send_notification')
+    def test_admin_stores_versioned_result(self, mock_send):
+        response = self.client.post('/api/simuadmin/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Simulation.objects.get(actual_group=self.group).version, 1)
+        tokens, data = mock_send.call_args.args
+        self.assertEqual(sorted(tokens), ['token1', 'token2'])
+        self.assertEqual(data['version'], '1')
+
+        self.client.post('/api/simuadmin/', self.data, format='json')
+        self.assertEqual(Simulation.objects.get(actual_group=self.group).version, 2)
+        for name in OUTPUT_NAMES:
+            self.assertTrue(os.path.exists(artifact_path(self.group.id, 2, name)))
+
+    @patch('interferometer.views.push_simulation_result')
+    @patch('interferometer.views.send_notification')
+    def test_admin_normalizes_group_id(self, mock_send, mock_push):
+        self.data["actual_group"] = "0" + str(self.group.id)
+        response = self.client.post('/api/simuadmin/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_send.call_args.args[1]['actual_group'], str(self.group.id))
+        group_id, message = mock_push.call_args.args
+        self.assertEqual(group_id, self.group.id)
+        self.assertEqual(message['actual_group'], self.group.id)
+        self.assertTrue(message['images'][0].endswith(artifact_url(self.group.id, 1, OUTPUT_NAMES[0])))
+
+    @patch('interferometer.views.send_notification')
+    def test_guest_gets_stored_result(self, mock_send):
+        admin_response = self.client.post('/api/simuadmin/', self.data, format='json')
+
+        with patch('interferometer.views.run_simulation') as mock_simulation:
+            response = self.client.get('/api/simulation/?actual_group=' + str(self.group.id))
+            mock_simulation.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, admin_response.data)
+        self.assertEqual(response['X-Simulation-Version'], '1')
+
+        response = self.client.get('/api/simulation/?output=psf&actual_group=' + str(self.group.id))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response['Location'], artifact_url(self.group.id, 1, 'psf'))
+
+    @patch('interferometer.views.send_notification')
+    def test_multipart_response(self, mock_send):
+        admin_response = self.client.post('/api/simuadmin/', self.data, format='json')
+        response = self.client.get(
+            '/api/simulation/?outputs=psf,dirty&actual_group=' + str(self.group.id),
+            HTTP_ACCEPT='multipart/mixed',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('multipart/mixed; boundary='))
+        message = email.message_from_bytes(
+            b'Content-Type: ' + response['Content-Type'].encode() + b'\r\n\r\n' + response.content
+        )
+        parts = message.get_payload()
+        self.assertEqual([part.get_filename() for part in parts], ['psf.png', 'dirty.png'])
+        images = [admin_response.data[OUTPUT_NAMES.index(name)]['img'] for name in ('psf', 'dirty')]
+        for part, image in zip(parts, images):
+            self.assertEqual(part.get_content_type(), 'image/png')
+            self.assertEqual(part.get_payload(decode=True), base64.b64decode(image))
+
+    @patch('interferometer.views.send_notification')
+    def test_arrays_response(self, mock_send):
+        response = self.client.post(
+            '/api/simuadmin/?outputs=sampling,coverage', self.data, format='json',
+            HTTP_ACCEPT='application/x-simulation-arrays',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-simulation-arrays')
+        arrays = decode_arrays(response.content)
+        self.assertEqual(list(arrays), ['sampling', 'coverage'])
+        pix = cv2.imread(MODEL_IMAGE, 0).shape[0]
+        self.assertEqual(arrays['sampling'].shape, (pix, pix))
+        self.assertEqual(arrays['sampling'].dtype, np.float32)
+        self.assertEqual(arrays['coverage'].shape[1], 2)
+        half = len(arrays['coverage']) // 2
+        np.testing.assert_array_equal(arrays['coverage'][:half], -arrays['coverage'][half:])
+
+        response = self.client.get(
+            '/api/simulation/?outputs=foo&actual_group=' + str(self.group.id),
+            HTTP_ACCEPT='application/x-simulation-arrays',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    @patch('interferometer.views.send_notification')
+    @patch('interferometer.jobs.get_executor', return_value=InlineExecutor())
+    def test_admin_async_job(self, mock_executor, mock_send):
+        response = self.client.post('/api/simuadmin/?async=true', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_url = reverse('simulation_job', args=[response.data['id']])
+        self.assertTrue(response['Location'].endswith(job_url))
+
+        response = self.client.get(job_url)
+        self.assertEqual(response.data['status'], SimulationJob.DONE)
+        self.assertEqual(response.data['progress'], 1.0)
+        self.assertEqual(response.data['version'], 1)
+        self.assertTrue(response.data['images'][0].endswith(artifact_url(self.group.id, 1, OUTPUT_NAMES[0])))
+        self.assertEqual(Simulation.objects.get(actual_group=self.group).version, 1)
+        mock_send.assert_called_once()
+
+    def test_pending_jobs_are_deduplicated(self):
+        job = SimulationJob.objects.create(key='llave', actual_group=self.group, status=SimulationJob.RUNNING)
+        with patch('interferometer.jobs.get_executor') as mock_executor:
+            same, created = submit_simulation_job(self.group.id, 'llave', None, None)
+            mock_executor.assert_not_called()
+        self.assertFalse(created)
+        self.assertEqual(same.id, job.id)
+
+        SimulationJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        with patch('interferometer.jobs.get_executor') as mock_executor:
+            new, created = submit_simulation_job(self.group.id, 'llave', None, None)
+            mock_executor.return_value.submit.assert_called_once()
+        self.assertTrue(created)
+        self.assertNotEqual(new.id, job.id)
+        self.assertEqual(SimulationJob.objects.get(id=job.id).status, SimulationJob.FAILED)
+
+    def test_jobs_are_deduplicated_per_group(self):
+        other = Group.objects.create(Group='Grupo B')
+        job = SimulationJob.objects.create(key='llave', actual_group=self.group, status=SimulationJob.RUNNING)
+        with patch('interferometer.jobs.get_executor') as mock_executor:
+            new, created = submit_simulation_job(other.id, 'llave', None, None)
+            mock_executor.return_value.submit.assert_called_once()
+        self.assertTrue(created)
+        self.assertNotEqual(new.id, job.id)
+        self.assertEqual(new.actual_group_id, other.id)
+
+    def test_expired_job_is_not_published(self):
+        job = SimulationJob.objects.create(key='llave', actual_group=self.group)
+        publish = []
+
+        def compute(progress):
+            SimulationJob.objects.filter(id=job.id).update(status=SimulationJob.FAILED, error='timeout')
+            return {}
+
+        run_job(job.id, compute, publish.append)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.FAILED)
+        self.assertEqual(job.error, 'timeout')
+        self.assertEqual(publish, [])
+
+    def test_failed_job(self):
+        job = SimulationJob.objects.create(key='llave', actual_group=self.group)
+        run_job(job.id, lambda progress: 1 / 0, None)
+        job.refresh_from_db()
+        self.assertEqual(job.status, SimulationJob.FAILED)
+        self.assertIn('division by zero', job.error)
+
+    @patch('interferometer.views.send_notification')
+    def test_busy_executor_returns_503(self, mock_send):
+        # Parametros distintos para no obtener el resultado desde la caché
+        self.data["parameter"]["declination"] = -30
+        with patch('interferometer.views.run_simulation', side_effect=ExecutorBusy()):
+            response = self.client.post('/api/simuadmin/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(Simulation.objects.filter(actual_group=self.group).exists())
+
+    @patch('interferometer.views.send_notification')
+    async def test_admin_pushes_result_to_group_channel(self, mock_send):
+        communicator = WebsocketCommunicator(application, f'/ws/simulation/{self.group.id}/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue(await communicator.receive_nothing())
+
+        response = await sync_to_async(self.client.post)('/api/simuadmin/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        message = await communicator.receive_json_from(timeout=5)
+        self.assertEqual(message['actual_group'], self.group.id)
+        self.assertEqual(message['version'], 1)
+        self.assertEqual(len(message['images']), len(OUTPUT_NAMES))
+        self.assertTrue(message['images'][0].endswith(artifact_url(self.group.id, 1, OUTPUT_NAMES[0])))
+        await communicator.disconnect()
+
+        # Un participante que se conecta después recibe la versión actual
+        communicator = WebsocketCommunicator(application, f'/ws/simulation/{self.group.id}/')
+        await communicator.connect()
+        self.assertEqual(await communicator.receive_json_from(), {
+            'actual_group': self.group.id,
+            'version': 1,
+            'images': [artifact_url(self.group.id, 1, name) for name in OUTPUT_NAMES],
+        })
+        await communicator.disconnect()
+
+        communicator = WebsocketCommunicator(
+            application, f'/ws/simulation/{self.group.id}/', headers=[(b'host', b'testserver')]
+        )
+        await communicator.connect()
+        self.assertEqual(await communicator.receive_json_from(), message)
+        await communicator.disconnect()
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+class DevicePositionsTestCase(TestCase):
+
+    def setUp(self):
+        self.group = Group.objects.create(Group='Grupo posiciones')
+        Device.objects.create(device_id='1', tokenFCM='token1', latitude=-41.464183, longitude=-72.919694, altitude=5.0, actual_group=self.group)
+        Device.objects.create(device_id='2', tokenFCM=None, latitude=-41.464507, longitude=-72.919898, altitude=None, actual_group=self.group)
+        Device.objects.create(device_id='3', tokenFCM='token3', latitude=None, longitude=None, altitude=None, actual_group=self.group)
+        Device.objects.create(device_id='4', tokenFCM='token4', latitude=1.0, longitude=2.0, altitude=3.0)
+
+    def test_device_positions(self):
+        positions = device_positions(self.group.id)
+        self.assertEqual(positions.dtype, np.float64)
+        np.testing.assert_array_equal(
+            positions, [[-41.464183, -72.919694, 5.0], [-41.464507, -72.919898, 0.0]]
+        )
+        self.assertEqual(device_positions(self.group.id + 100).shape, (0, 3))
+
+    def test_simulation_context(self):
+        image = Imagen.objects.create(archivo='img/cat.png')
+        RefPoint.objects.create(latitude=-41.463874, longitude=-72.920166, altitude=None, actual_group=self.group)
+        Parameters.objects.create(
+            observationTime=2, declination=40, samplingTime=6, frequency=90, idPath=image.id,
+            groupId=self.group.id, scale=1.0, scheme='natural', robust_param=0.0,
+        )
+        with self.assertNumQueries(2):
+            context = fetch_simulation_context(self.group.id)
+        np.testing.assert_array_equal(context.positions, device_positions(self.group.id))
+        self.assertEqual(context.tokens, ['token1', 'token3'])
+        self.assertEqual(
+            context.device_ids,
+            list(Device.objects.filter(device_id__in=['1', '2'], actual_group=self.group).order_by('id').values_list('id', flat=True)),
+        )
+        self.assertEqual(context.reference[:2].tolist(), [-41.463874, -72.920166])
+        self.assertEqual(context.parameters['scheme'], 'natural')
+        self.assertEqual(context.parameters['samplingTime'], 6)
+        self.assertEqual(context.image_id, image.id)
+        self.assertEqual(context.image_name, 'img/cat.png')
+        self.assertIsNone(fetch_simulation_context(self.group.id + 100))
+
+    def test_simulation_context_is_invalidated(self):
+        RefPoint.objects.create(latitude=-41.463874, longitude=-72.920166, altitude=0.0, actual_group=self.group)
+        context = load_simulation_context(self.group.id)
+        self.assertIsNone(context.parameters)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(load_simulation_context(self.group.id).positions), 2)
+
+        device = Device.objects.get(device_id='3')
+        device.latitude, device.longitude = -41.4641, -72.9203
+        device.save()
+        self.assertEqual(len(load_simulation_context(self.group.id).positions), 3)
+
+        Parameters.objects.create(groupId=self.group.id, idPath=1, scheme='uniform')
+        self.assertEqual(load_simulation_context(self.group.id).parameters['scheme'], 'uniform')
+
+        Device.objects.filter(device_id='1').delete()
+        self.assertEqual(load_simulation_context(self.group.id).tokens, ['token3'])
+
+    def test_process_local_cache_is_skipped_with_several_workers(self):
+        RefPoint.objects.create(latitude=-41.463874, longitude=-72.920166, altitude=0.0, actual_group=self.group)
+        load_simulation_context(self.group.id)
+        with patch.dict(os.environ, {"WEB_CONCURRENCY": "4"}):
+            with self.assertNumQueries(2):
+                load_simulation_context(self.group.id)
+
+    def tearDown(self):
+        cache.clear()
+
+class StubMessaging:
+
+    """
+    Cliente de FCM de prueba. responses: lista de funciones token -> excepción o None, una por envío.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def MulticastMessage(self, tokens, data):
+        return SimpleNamespace(tokens=tokens, data=data)
+
+    def send_each_for_multicast(self, message):
+        self.sent.append(list(message.tokens))
+        outcome = self.responses.pop(0) if self.responses else (lambda token: None)
+        if isinstance(outcome, Exception):
+            raise outcome
+        results = [outcome(token) for token in message.tokens]
+        return SimpleNamespace(responses=[
+            SimpleNamespace(success=error is None, exception=error) for error in results
+        ])
+
+class NotificationDispatcherTestCase(TestCase):
+
+    def setUp(self):
+        self.group = Group.objects.create(Group='Grupo notificaciones')
+        for i in range(3):
+            Device.objects.create(device_id=str(i), tokenFCM=f'token{i}', actual_group=self.group)
+
+    def test_tokens_are_sent_in_batches(self):
+        client = StubMessaging()
+        dispatcher = NotificationDispatcher(client, batch_size=500, backoff=0)
+        tokens = [f'token{i}' for i in range(1201)]
+        self.assertEqual(dispatcher.send(tokens, {'version': '1'}), (1201, 0))
+        self.assertEqual([len(batch) for batch in client.sent], [500, 500, 201])
+
+    def test_retry_and_prune_unregistered(self):
+        unregistered = lambda token: messaging.UnregisteredError('no registrado') if token == 'token1' else None
+        unavailable = lambda token: exceptions.UnavailableError('no disponible') if token == 'token2' else None
+        client = StubMessaging(exceptions.UnavailableError('no disponible'), lambda token: unregistered(token) or unavailable(token), unregistered)
+        dispatcher = NotificationDispatcher(client, backoff=0)
+        self.assertEqual(dispatcher.send(['token0', 'token1', 'token2'], {'version': '1'}), (2, 1))
+        self.assertEqual(client.sent, [['token0', 'token1', 'token2'], ['token0', 'token1', 'token2'], ['token2']])
+        self.assertEqual(
+            sorted(Device.objects.filter(tokenFCM__isnull=False).values_list('tokenFCM', flat=True)),
+            ['token0', 'token2'],
+        )
+
+    def test_submit_sends_in_background(self):
+        client = StubMessaging()
+        dispatcher = NotificationDispatcher(client)
+        self.assertTrue(dispatcher.submit(['token0', None, 'token1'], {'version': '2'}))
+        dispatcher.join()
+        self.assertEqual(client.sent, [['token0', 'token1']])
+
+class TestSpectrumCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "modelo.png")
+        shutil.copy("./img/cat.png", self.path)
+
+    def test_spectrum_is_computed_once(self):
+        spectrum_cache = SpectrumCache()
+        with patch("interferometer.spectra.cv2.imread", wraps=cv2.imread) as mock_imread:
+            img1, ft1 = spectrum_cache.get(1, self.path)
+            img2, ft2 = spectrum_cache.get(1, self.path)
+        self.assertEqual(mock_imread.call_count, 1)
+        self.assertIs(ft1, ft2)
+        pix, expected = fft_model_image(self.path)
+        self.assertEqual(pix, img1.shape[0])
+        np.testing.assert_array_almost_equal(ft1, expected)
+
+    def test_modified_file_is_reloaded(self):
+        spectrum_cache = SpectrumCache()
+        _, ft1 = spectrum_cache.get(1, self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        _, ft2 = spectrum_cache.get(1, self.path)
+        self.assertIsNot(ft1, ft2)
+
+    @patch("interferometer.spectra._load", side_effect=compute_spectrum)
+    def test_invalidate_and_memory_budget(self, mock_load):
+        _, ft = SpectrumCache().get(1, self.path)
+        spectrum_cache = SpectrumCache(max_bytes=int(1.5 * (ft.nbytes + ft.real.astype(np.uint8).nbytes)))
+        spectrum_cache.get(1, self.path)
+        spectrum_cache.get(2, self.path)
+        self.assertEqual(list(spectrum_cache._entries), [2])
+        self.assertLessEqual(spectrum_cache.current_bytes, spectrum_cache.max_bytes)
+        spectrum_cache.invalidate(2)
+        self.assertEqual(spectrum_cache.current_bytes, 0)
+
+    def test_sidecars_are_memory_mapped(self):
+        write_sidecars(self.path)
+        pixels, spectrum = load_sidecars(self.path)
+        self.assertIsInstance(spectrum, np.memmap)
+        _, expected = compute_spectrum(self.path)
+        np.testing.assert_array_equal(spectrum, expected)
+
+        spectrum_cache = SpectrumCache()
+        with patch("interferometer.spectra.cv2.imread") as mock_imread:
+            _, cached = spectrum_cache.get(1, self.path)
+        mock_imread.assert_not_called()
+        self.assertIsInstance(cached, np.memmap)
+        self.assertEqual(spectrum_cache.current_bytes, 0)
+
+    def test_stale_sidecars_are_ignored(self):
+        write_sidecars(self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(load_sidecars(self.path))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+class TestGeodeticToENUParity(unittest.TestCase):
+
+    # Centro del VLA (WGS84) y configuraciones del directorio "jupyter notebook"
+    VLA_CENTER = (34.078749, -107.617728, 2124.0)
+    VLA_CONFIGS = ("VLA_North.csv", "VLA_SEast.csv", "VLA_SWest.csv")
+    TOLERANCE = 1e-6  # metros
+
+    def vla_geodetic(self, filename):
+        # Las posiciones se encuentran en nanosegundos en el sistema local del VLA (X en el meridiano local)
+        path = os.path.join(settings.BASE_DIR.parent, "jupyter notebook", filename)
+        xyz = np.loadtxt(path, delimiter=",", skiprows=1) * const_c * 1e-9
+        lon = np.radians(self.VLA_CENTER[1])
+        rotation = np.array([[np.cos(lon), -np.sin(lon), 0], [np.sin(lon), np.cos(lon), 0], [0, 0, 1]])
+        center = EarthLocation.from_geodetic(self.VLA_CENTER[1], self.VLA_CENTER[0], self.VLA_CENTER[2])
+        ecef = np.array([v.value for v in center.to_geocentric()]).reshape(3, 1) + rotation @ xyz.T
+        lon, lat, height = EarthLocation.from_geocentric(ecef[0], ecef[1], ecef[2], unit="m").to_geodetic()
+        return np.column_stack((lat.value, lon.value, height.value))
+
+    def test_vla_configurations(self):
+        for filename in self.VLA_CONFIGS:
+            coords = self.vla_geodetic(filename)
+            expected = geodetic_to_enu_astropy(coords, self.VLA_CENTER)
+            result = geodetic_to_enu(coords, self.VLA_CENTER)
+            np.testing.assert_allclose(result, expected, rtol=0, atol=self.TOLERANCE)
+
+    def test_astropy_setting(self):
+        coords = self.vla_geodetic(self.VLA_CONFIGS[0])
+        with override_settings(GEODETIC_TRANSFORM="astropy"), patch("interferometer.functions.geodetic_to_enu_astropy") as mock_astropy:
+            geodetic_to_enu(coords, self.VLA_CENTER)
+        mock_astropy.assert_called_once()
+
+class TestUVCoverageChunks(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.baselines = bENU_to_bEquatorial(baselines(rng.normal(0, 100, (3, 6))), -41.46)
+        self.HA, self.dec = compute_h(2, 40, 6)
+        self.wavelength = 0.003199492614727855
+        R_matrix = calc_RR(self.HA, self.dec)
+        uvw_dot = np.sum(R_matrix[...,np.newaxis]*self.baselines[np.newaxis,:,np.newaxis,:], axis=1)
+        self.expected = np.column_stack((uvw_dot[0].reshape(-1), uvw_dot[1].reshape(-1)))/self.wavelength
+
+    def test_hermitian_pairs(self):
+        half, mirror = hermitian_pairs(self.baselines)
+        self.assertEqual(len(half), 15)
+        np.testing.assert_array_almost_equal(self.baselines[:, half], -self.baselines[:, mirror])
+        self.assertIsNone(hermitian_pairs(self.baselines[:, :7]))
+
+    def test_chunks_match_full_rotation(self):
+        for chunk_size in (1, 7, 1000):
+            result = uv_coverage(self.baselines, self.HA, self.dec, self.wavelength, chunk_size=chunk_size)
+            np.testing.assert_allclose(result, self.expected, rtol=1e-9, atol=1e-6)
+
+    def test_unpaired_baselines_and_float32(self):
+        subset = self.baselines[:, :7]
+        result = uv_coverage(subset, self.HA, self.dec, self.wavelength, chunk_size=4, dtype=np.float32)
+        expected = self.expected.reshape(self.HA.size, -1, 2)[:, :7].reshape(-1, 2)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-2)
+
+class TestHermitianBaselines(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.enu = rng.normal(0, 100, (3, 6))
+        self.latitude = -41.46
+        self.HA, self.dec = compute_h(2, 40, 6)
+        self.wavelength = 0.003199492614727855
+
+    def test_half_baselines(self):
+        full = baselines(self.enu)
+        half = baselines(self.enu, half=True)
+        self.assertEqual(half.shape, (3, 15))
+        pairs = hermitian_pairs(full)
+        np.testing.assert_array_equal(full[:, pairs[0]], half)
+
+    def test_half_plane_gridding_matches_full(self):
+        full = bENU_to_bEquatorial(baselines(self.enu), self.latitude)
+        half = bENU_to_bEquatorial(baselines(self.enu, half=True), self.latitude)
+        uv_full = uv_coverage(full, self.HA, self.dec, self.wavelength)
+        uv_half = uv_coverage(half, self.HA, self.dec, self.wavelength, half=True)
+        self.assertEqual(2 * len(uv_half), len(uv_full))
+        max_B = np.max(np.abs(full))
+        self.assertEqual(max_B, np.max(np.abs(half)))
+        for scheme in ("natural", "uniform"):
+            grid_full, _ = grid_sampling(64, max_B, uv_full, self.wavelength, scheme, 0.)
+            grid_half, _ = grid_sampling(64, max_B, uv_half, self.wavelength, scheme, 0., hermitian=True)
+            np.testing.assert_array_equal(grid_full, grid_half)
+
+class TestLazyRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.coords = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]])
+        self.reference = np.array([-41.463874, -72.920166, 0.0])
+
+    def test_simulation_returns_arrays(self):
+        with patch("matplotlib.pyplot.figure") as mock_figure:
+            result = simulation(2, 40, 6, "./img/cat.png", self.coords, self.reference, 90, "natural", 0.)
+        mock_figure.assert_not_called()
+        pix = cv2.imread("./img/cat.png", 0).shape[0]
+        self.assertEqual(result.weights.shape, (pix, pix))
+        self.assertEqual(result.psf.shape, (pix, pix))
+        self.assertEqual(result.dirty.shape, (pix, pix))
+        self.assertEqual(result.uv.shape[1], 2)
+
+    def test_render_only_requested_outputs(self):
+        result = simulation(2, 40, 6, "./img/cat.png", self.coords, self.reference, 90, "natural", 0.)
+        outputs = parse_outputs("dirty,psf")
+        with patch("interferometer.render.render_coverage") as mock_coverage:
+            images = render(result, outputs)
+        mock_coverage.assert_not_called()
+        self.assertEqual(list(images), ["dirty", "psf"])
+        for image in images.values():
+            self.assertTrue(image.startswith(b"\x89PNG"))
+
+    def test_parse_outputs(self):
+        self.assertEqual(parse_outputs(None), OUTPUT_NAMES)
+        self.assertEqual(parse_outputs("psf, dirty"), ("psf", "dirty"))
+        with self.assertRaises(ValueError):
+            parse_outputs("dirty,foo")
+
+
+class TestSimulationExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.args = (
+            2, 40, 6, "./img/cat.png",
+            np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]]),
+            np.array([-41.463874, -72.920166, 0.0]),
+            90, "natural", 0.,
+        )
+
+    def test_shared_memory_roundtrip(self):
+        result = simulation(*self.args)
+        copy = from_shared_memory(*to_shared_memory(result))
+        self.assertEqual(copy.hermitian, result.hermitian)
+        for name in ("uv", "weights", "psf", "dirty"):
+            np.testing.assert_array_equal(getattr(copy, name), getattr(result, name))
+
+    def test_process_pool_matches_inline(self):
+        executor = SimulationExecutor(workers=1, max_tasks_per_child=1)
+        try:
+            first = executor.run(*self.args)
+            # El proceso se reemplaza luego de cada simulación
+            second = executor.run(*self.args)
+        finally:
+            executor.shutdown()
+        expected = simulation(*self.args)
+        np.testing.assert_allclose(first.dirty, expected.dirty)
+        np.testing.assert_allclose(second.psf, expected.psf)
+
+    def test_full_queue_raises_busy(self):
+        executor = SimulationExecutor(workers=1, queue_depth=0, queue_timeout=0.01)
+        try:
+            executor._slots.acquire()
+            with self.assertRaises(ExecutorBusy):
+                executor.run(*self.args)
+        finally:
+            executor._slots.release()
+            executor.shutdown()
+
+
+class TestBaselineGeometry(unittest.TestCase):
+
+    def setUp(self):
+        self.coords = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]])
+        self.reference = np.array([-41.463874, -72.920166, 0.0])
+        get_geometry_cache().clear()
+
+    def test_quantize_positions(self):
+        # 1 cm de diferencia en latitud cae en el mismo paso de 5 cm, 10 cm no
+        moved = self.coords + [0.01 / 111320, 0, 0]
+        np.testing.assert_array_equal(quantize_positions(self.coords, 0.05), quantize_positions(moved, 0.05))
+        moved = self.coords + [0.1 / 111320, 0, 0]
+        self.assertFalse(np.array_equal(quantize_positions(self.coords, 0.05), quantize_positions(moved, 0.05)))
+
+    def test_geometry_is_reused_within_tolerance(self):
+        geometry = baseline_geometry(self.coords, self.reference, half=True)
+        np.testing.assert_array_equal(geometry, equatorial_baselines(self.coords, self.reference, True))
+        self.assertIs(baseline_geometry(self.coords + [0, 0, 0.001], self.reference, half=True), geometry)
+        self.assertIsNot(baseline_geometry(self.coords + [0, 0, 1.0], self.reference, half=True), geometry)
+        self.assertIsNot(baseline_geometry(self.coords, self.reference, half=False), geometry)
+        with override_settings(BASELINE_GEOMETRY_CACHE={"TOLERANCE": 0}):
+            self.assertIsNot(baseline_geometry(self.coords, self.reference, half=True), geometry)
+
+    def test_simulation_with_cached_geometry(self):
+        args = (2, 40, 6, "./img/cat.png", self.coords, self.reference, 90, "natural", 0., None)
+        expected = simulation(*args)
+        result = simulation(*args, baseline_equatorial=baseline_geometry(self.coords, self.reference))
+        np.testing.assert_array_equal(result.uv, expected.uv)
+        np.testing.assert_array_equal(result.dirty, expected.dirty)
+
+
+class TestGroupGeometry(unittest.TestCase):
+
+    def setUp(self):
+        self.reference = np.array([-41.463874, -72.920166, 0.0])
+        rng = np.random.default_rng(0)
+        self.coords = self.reference + np.column_stack((rng.uniform(-1e-3, 1e-3, (20, 2)), rng.uniform(0, 5, 20)))
+        self.ids = list(range(100, 120))
+
+    def assert_matches_full(self, geometry, ids, coords):
+        # Los baselines deben coincidir con el cálculo completo en el orden interno de los dispositivos
+        order = [ids.index(device_id) for device_id in geometry._ids]
+        expected = equatorial_baselines(coords[order], self.reference, geometry.half)
+        np.testing.assert_allclose(geometry.baselines(), expected, atol=1e-9)
+
+    def test_incremental_updates_match_full_computation(self):
+        for half in (True, False):
+            geometry = GroupGeometry(self.reference, half, capacity=4)
+            ids, coords = list(self.ids), self.coords.copy()
+            geometry.sync(ids, coords)
+            self.assert_matches_full(geometry, ids, coords)
+
+            coords[3] += [1e-5, 0, 1]
+            with patch.object(GroupGeometry, "rebuild") as mock_rebuild:
+                geometry.sync(ids, coords)
+                ids.append(7)
+                coords = np.vstack((coords, self.reference + [2e-4, 1e-4, 0]))
+                geometry.sync(ids, coords)
+                del ids[0]
+                coords = coords[1:]
+                geometry.sync(ids, coords)
+                mock_rebuild.assert_not_called()
+            self.assertEqual(len(geometry), 20)
+            self.assert_matches_full(geometry, ids, coords)
+
+    def test_equatorial_matrix(self):
+        b_enu = self.coords[:5].T
+        np.testing.assert_allclose(equatorial_matrix(-30) @ b_enu, bENU_to_bEquatorial(b_enu, -30))
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   numpy.core\n"
+            "import time:      3000 |       3120 | numpy\n"
+        )
+        self.assertEqual(parse_importtime(output), {"numpy.core": (120, 120), "numpy": (3000, 3120)})
+
+    def test_views_import_without_scientific_stack(self):
+        modules = import_times("interferometer.views")
+        self.assertIn("interferometer.views", modules)
+        for name in ("matplotlib", "cmcrameri", "astropy", "pandas"):
+            self.assertNotIn(name, modules)
+
+
+class TestFastRenderer(unittest.TestCase):
+
+    def test_colormap_matches_matplotlib(self):
+        import cmcrameri.cm as cmc
+        from matplotlib.colors import Normalize
+
+        array = np.random.default_rng(0).normal(size=(32, 48))
+        for vmax in (None, 0.1):
+            png = colormap_png(array, vmax=vmax)
+            decoded = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+            expected = cmc.tofino_r(Normalize(vmax=vmax)(array), bytes=True)[..., 2::-1]
+            self.assertEqual(decoded.shape, (32, 48, 3))
+            self.assertLessEqual(np.abs(decoded.astype(int) - expected).max(), 3)
+
+    def test_rasterize_uv(self):
+        uv = np.array([[-1.0, -1.0], [1.0, 1.0], [0.0, 0.0]])
+        canvas = rasterize_uv(uv, size=11, margin=0)
+        self.assertEqual(canvas[10, 0], 0)
+        self.assertEqual(canvas[0, 10], 0)
+        self.assertEqual(canvas[5, 5], 0)
+        self.assertEqual(np.count_nonzero(canvas == 0), 3)
+
+    def test_rasterize_uv_mirror(self):
+        uv = np.array([[1.0, 0.5], [0.5, -1.0]])
+        mirrored = rasterize_uv(uv, size=65, mirror=True)
+        full = rasterize_uv(np.concatenate((uv, -uv)), size=65)
+        np.testing.assert_array_equal(mirrored, full)
+
+    @override_settings(RENDERER="matplotlib")
+    def test_matplotlib_renderer_is_thread_safe(self):
+        coords = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]])
+        reference = np.array([-41.463874, -72.920166, 0.0])
+        results = [
+            simulation(2, declination, 6, "./img/cat.png", coords, reference, 90, "natural", 0.)
+            for declination in (-30, 40)
+        ]
+        expected = [render(result) for result in results]
+        rendered = [None] * 8
+
+        def run(index):
+            rendered[index] = render(results[index % 2])
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(rendered))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index, images in enumerate(rendered):
+            self.assertEqual(images, expected[index % 2])
+
+    @override_settings(RENDERER="matplotlib")
+    def test_job_threads_render_alongside_requests(self):
+        coords = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]])
+        reference = np.array([-41.463874, -72.920166, 0.0])
+        job_result = simulation(2, -30, 6, "./img/cat.png", coords, reference, 90, "natural", 0.)
+        request_result = simulation(2, 40, 6, "./img/cat.png", coords, reference, 90, "natural", 0.)
+        expected = render(job_result)
+        executor = ThreadExecutor(max_workers=2)
+        try:
+            futures = [executor.submit(render, job_result) for _ in range(4)]
+            request_images = [render(request_result) for _ in range(2)]
+            job_images = [future.result() for future in futures]
+        finally:
+            executor.shutdown()
+        self.assertTrue(all(images == expected for images in job_images))
+        self.assertEqual(request_images[0], request_images[1])
+
+    @override_settings(RENDERER="fast")
+    def test_fast_renderer_does_not_use_pyplot(self):
+        coords = np.array([[-41.464183, -72.919694, 0.0], [-41.464507, -72.919898, 0.0], [-41.4641, -72.9203, 0.0]])
+        reference = np.array([-41.463874, -72.920166, 0.0])
+        result = simulation(2, 40, 6, "./img/cat.png", coords, reference, 90, "natural", 0.)
+        with patch("matplotlib.pyplot.figure") as mock_figure:
+            images = render(result)
+        mock_figure.assert_not_called()
+        self.assertEqual(list(images), list(OUTPUT_NAMES))
+        for image in images.values():
+            self.assertTrue(image.startswith(b"\x89PNG"))
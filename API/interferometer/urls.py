@@ -16,5 +16,6 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/verify/', TokenVerifyView.as_view(), name='token_verify'),
-    path('simuadmin/', views.simuAdmin)
+    path('simuadmin/', views.simuAdmin),
+    path('simuadmin/jobs/<int:job_id>/', views.simulationJob, name="simulation_job"),
 ]
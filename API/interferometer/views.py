@@ -1,24 +1,42 @@
 from django.conf import settings
+import os
+import base64
 import numpy as np
-import pandas as pd
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, renderer_classes
 from rest_framework import viewsets
 from .serializers import (
     DeviceSerializer,
+    DeviceUpsertSerializer,
+    BulkPositionSerializer,
     AdminSerializer,
     GroupSerializer,
     RefPointSerializer,
     ImagenSerializer,
     ParametersSerializer,
     ParameterGroupSerializer,
+    SimulationJobSerializer,
 )
-from .functions import simulation, new_positions
-from .models import Device, Admin, Group, RefPoint, Imagen, Parameters
+from .functions import new_positions
+from .cache import get_result_cache, simulation_key
+from .context import invalidate_simulation_context, load_simulation_context
+from .spectra import get_spectrum_cache, remove_sidecars, write_sidecars
+from .artifacts import store_simulation, read_simulation, artifact_url, artifact_urls
+from .consumers import push_simulation_result
+from .executor import run_simulation
+from .geometry import baseline_geometry
+from .jobs import submit_simulation_job
+from .notifications import send_notification
+from .render import OUTPUT_NAMES, get_renderers, output_arrays, parse_outputs
+from .renderers import SIMULATION_RENDERERS, ArrayContainerRenderer, MultipartImageRenderer
+from .models import Device, Admin, Group, RefPoint, Imagen, Parameters, Simulation, SimulationJob
 from django.utils import timezone
 from rest_framework import status
-from firebase_admin import messaging
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
 """
 
@@ -26,7 +44,197 @@ https://www.django-rest-framework.org/api-guide/views/
 """
 
 
+def simulation_loader(positions, reference, parameters, image_id, image_name, group=None):
+
+    """
+    Prepara la simulación de un grupo sin ejecutarla.
+
+    Todos los participantes de un grupo comparten las mismas entradas, por lo que la llave de
+    caché se calcula a partir de las posiciones, el punto de referencia, los parametros y el ID
+    de la imagen modelo.
+
+    Retorna la llave y una función que ejecuta la simulación la primera vez que se llama y
+    luego retorna el mismo resultado, de modo que se ejecuta a lo más una vez por petición.
+    La simulación se ejecuta en el pool de procesos si está configurado (ver "executor.py") y los
+    baselines se obtienen desde la caché de geometría (ver "geometry.py").
+
+    group: ID del grupo e IDs de los dispositivos de positions, para actualizar los baselines del
+    grupo de forma incremental cuando solo algunos dispositivos se movieron.
+    """
+
+    image_path = os.path.join(settings.MEDIA_ROOT, image_name)
+    key = simulation_key(positions, reference, parameters, image_id, image_name)
+    result = None
+
+    def load():
+        nonlocal result
+        if result is None:
+            new_pos = new_positions(positions, reference, parameters["scale"])
+            geometry = baseline_geometry(new_pos, reference, group=group)
+            result = run_simulation(
+                parameters["observationTime"],
+                parameters["declination"],
+                parameters["samplingTime"],
+                image_path,
+                new_pos,
+                reference,
+                parameters["frequency"],
+                parameters["scheme"],
+                parameters["robust_param"],
+                image_id,
+                geometry,
+            )
+        return result
+
+    return key, load
+
+
+def missing_context_response(context):
+
+    """
+    Respuesta 404 si el grupo o su punto de referencia no existen, en otro caso None.
+    """
+
+    if context is None:
+        return Response({"detail": "grupo no encontrado."}, status=404)
+    if context.reference is None:
+        return Response({"detail": "punto de referencia no encontrado."}, status=404)
+    return None
+
+
+def simulation_images(loader, outputs=OUTPUT_NAMES, progress=None):
+
+    """
+    Obtiene las imagenes solicitadas de la simulación a través de la caché de resultados.
+
+    Cada imagen se guarda en caché por separado y solo se generan las que se solicitan
+    (ver "render.py"). La simulación solo se ejecuta si falta alguna de las imagenes; las
+    peticiones concurrentes con la misma llave esperan el resultado en lugar de volver a calcularlo.
+
+    loader: llave y función retornadas por simulation_loader.
+    progress: función opcional que recibe la fracción de imagenes obtenidas.
+
+    Retorna un diccionario nombre -> PNG.
+    """
+
+    key, load = loader
+    result_cache = get_result_cache()
+    images = {}
+    for i, name in enumerate(outputs):
+        images[name] = result_cache.get_or_compute(
+            f"{key}:{name}", lambda name=name: get_renderers()[name](load())
+        )
+        if progress is not None:
+            progress((i + 1) / len(outputs))
+    return images
+
+
+def simulation_arrays(loader, outputs=OUTPUT_NAMES):
+
+    """
+    Igual que simulation_images, pero obtiene los arreglos de la simulación sin generar imagenes
+    (ver "output_arrays" en "render.py"). Los arreglos de todas las salidas se guardan juntos en caché.
+
+    Retorna un diccionario nombre -> arreglo.
+    """
+
+    key, load = loader
+    arrays = get_result_cache().get_or_compute(f"{key}:arrays", lambda: output_arrays(load()))
+    return {name: arrays[name] for name in outputs}
+
+
+def wants_arrays(request):
+    return request.accepted_renderer.format == ArrayContainerRenderer.format
+
+
+def images_response(request, images, outputs, headers=None):
+
+    """
+    Respuesta con las imagenes en el orden de las salidas solicitadas. Por defecto se entregan
+    en base64 dentro de una lista JSON, y como PNG sin codificar si el cliente pidió
+    "multipart/mixed" (ver "renderers.py").
+    """
+
+    if request.accepted_renderer.format == MultipartImageRenderer.format:
+        data = [(name, images[name]) for name in outputs]
+    else:
+        data = [{"img": base64.b64encode(images[name]).decode()} for name in outputs]
+    return Response(data, status=200, headers=headers)
+
+
+def arrays_response(arrays, outputs, headers=None):
+
+    """
+    Respuesta con los arreglos de la simulación en el contenedor binario de ArrayContainerRenderer.
+    """
+
+    return Response([(name, arrays[name]) for name in outputs], status=200, headers=headers)
+
+
+def publish_simulation(id_group, images, tokens, base_url):
+
+    """
+    Guarda las imagenes como una nueva versión del resultado del grupo (ver "artifacts.py") y la
+    envía a los participantes conectados al canal WebSocket del grupo (ver "consumers.py"), junto a
+    una notificación FCM en segundo plano para los que no están conectados (ver "notifications.py").
+
+    id_group: ID del grupo ya validado (entero, ver "load_simulation_context"), del cual dependen la
+    ruta de las imagenes, el canal WebSocket y la notificación.
+
+    Retorna la instancia de Simulation con la versión guardada.
+    """
+
+    stored = store_simulation(id_group, images)
+    push_simulation_result(
+        id_group,
+        {
+            "actual_group": id_group,
+            "version": stored.version,
+            "images": artifact_urls(base_url, id_group, stored.version),
+        },
+    )
+    send_notification(tokens, {"actual_group": str(id_group), "version": str(stored.version)})
+    return stored
+
+
+def stored_simulation_response(request, stored, outputs):
+
+    """
+    Respuesta de simuGuest a partir del resultado guardado por el administrador.
+
+    - "?output=<nombre>": redirige a la imagen en disco, la cual es servida por nginx.
+    - "?urls=true": retorna la versión y las URL de las imagenes solicitadas.
+    - Sin parametros: retorna las imagenes solicitadas en base64, igual que la simulación.
+
+    Retorna None si los archivos de la versión guardada ya no existen.
+    """
+
+    group_id, version = stored.actual_group_id, stored.version
+    headers = {"X-Simulation-Version": str(version)}
+    output = request.query_params.get("output")
+    if output is not None:
+        if output not in OUTPUT_NAMES:
+            return Response({"detail": "output no valido."}, status=400)
+        return HttpResponseRedirect(artifact_url(group_id, version, output), headers=headers)
+
+    if request.query_params.get("urls") == "true":
+        return Response(
+            {
+                "version": version,
+                "images": artifact_urls(request.build_absolute_uri("/"), group_id, version, outputs),
+            },
+            status=200,
+            headers=headers,
+        )
+
+    images = read_simulation(stored, outputs)
+    if images is None:
+        return None
+    return images_response(request, images, outputs, headers)
+
+
 @api_view(["GET"])
+@renderer_classes(SIMULATION_RENDERERS)
 def simuGuest(request):
 
     """
@@ -38,79 +246,74 @@ def simuGuest(request):
     se logra recibiendo el grupo al cual pertenecen los dispositivos desde la petición GET
     para así proceder con la obtención de la información.
     
-    Por lo tanto, solo se recibe el ID del grupo y se utiliza para filtrar en los objetos/entidades 
-    Device, RefPoint y Parameters, para luego utilizar los serializers de cada uno y así obtenerlos en 
-    tipos de datos con los que Python pueda trabajar.
+    Si el administrador ya realizó la simulación del grupo, el resultado se encuentra guardado en disco
+    (ver "artifacts.py") y solo se entrega la versión guardada, sin volver a simular.
+
+    En caso contrario, se recibe el ID del grupo y se utiliza para obtener los dispositivos, el punto
+    de referencia, los parametros y la imagen modelo del grupo (ver "context.py"), los cuales se
+    consultan en dos consultas y se guardan en caché por grupo hasta que alguno de ellos cambia.
 
     Luego se manejan dichos datos para poder pasarlos como argumentos a las funciones "new_position" y 
     "simulation", finalizando con el envío de los resultados al dispositivo invitado/participante que
-    realizó la petición GET.
+    realizó la petición GET. Como todos los participantes del grupo piden la misma simulación, el
+    resultado se obtiene desde la caché de resultados (ver "simulation_images").
+
+    Con "?outputs=dirty,psf" solo se generan y entregan las imagenes indicadas, en dicho orden.
+
+    El formato de la respuesta se elige con el header "Accept" (ver "renderers.py"): JSON con las
+    imagenes en base64 por defecto, "multipart/mixed" con los PNG o "application/x-simulation-arrays"
+    con los arreglos. Los arreglos no se guardan en disco, por lo que siempre se obtienen de la simulación.
     
     
     """
 
-    #1
+    #0
+    try:
+        outputs = parse_outputs(request.query_params.get("outputs"))
+    except ValueError:
+        return Response({"detail": "outputs no valido."}, status=400)
     id_group = request.query_params.get("actual_group")
-    locations = Device.objects.filter(actual_group=id_group)
-    refpoint = RefPoint.objects.filter(actual_group=id_group)
-    parameters = Parameters.objects.filter(groupId=id_group)
-    locations_serializer = DeviceSerializer(locations, many=True)
-    refpoint_serializer = RefPointSerializer(refpoint, many=True)
-    parameters_serializer = ParametersSerializer(parameters, many=True)
-    refpoint_data = refpoint_serializer.data
-    parameters_data = parameters_serializer.data
+    stored = Simulation.objects.filter(actual_group=id_group).first()
+    if stored is not None and not wants_arrays(request):
+        response = stored_simulation_response(request, stored, outputs)
+        if response is not None:
+            return response
+
+    #1
+    context = load_simulation_context(id_group)
+    error = missing_context_response(context)
+    if error is not None:
+        return error
+    if context.parameters is None or context.image_name is None:
+        return Response({"detail": "parametros o imagen no encontrados."}, status=404)
 
     #2
-    dvice = pd.DataFrame(locations_serializer.data)
-    imagen_instance = get_object_or_404(Imagen, id=parameters_data[0]["idPath"])
-    image_path = "./media/" + imagen_instance.archivo.name
-    dvice = dvice.drop(
-        ["id", "device_id", "actual_group", "modified_at", "tokenFCM", "distance"], axis=1
-    )
-    array = np.array(dvice).astype(float)
-    reference = np.array(
-        [
-            refpoint_data[0]["latitude"],
-            refpoint_data[0]["longitude"],
-            refpoint_data[0]["altitude"],
-        ]
-    )
-    new_pos = new_positions(array, reference, parameters_data[0]["scale"])
-    img_dirty, img_coverage, img_sampling, img_psf = simulation(
-        parameters_data[0]["observationTime"],
-        parameters_data[0]["declination"],
-        parameters_data[0]["samplingTime"],
-        image_path,
-        new_pos,
-        reference,
-        parameters_data[0]["frequency"],
-        parameters_data[0]["scheme"],
-        parameters_data[0]["robust_param"]
-    )
-    return Response(
-        [
-            {"img": img_dirty},
-            {"img": img_coverage},
-            {"img": img_sampling},
-            {"img": img_psf},
-        ],
-        status=200,
+    loader = simulation_loader(
+        context.positions, context.reference, context.parameters, context.image_id, context.image_name,
+        group=(context.group_id, context.device_ids),
     )
+    if wants_arrays(request):
+        return arrays_response(simulation_arrays(loader, outputs), outputs)
+    images = simulation_images(loader, outputs)
+    return images_response(request, images, outputs)
 
 
 class DeviceViewSet(viewsets.ModelViewSet):
 
     """
-    View para los device/dispositivo. Se encuentra modificado el GET, UPDATE y DELETE.
+    View para los device/dispositivo. Se encuentra modificado el GET, UPDATE y DELETE, y se agrega
+    POST "bulk" para actualizar las posiciones de varios dispositivos a la vez.
 
     GET: Filtra por los parametros dado en la query, los cuales son "actual_group" y "device_id"
     devolviendo así la información del dispositivo que solo cumple dichas condiciones.
 
     UPDATE: Filtra por los parametros dado en la query, los cuales son "actual_group" y "device_id"
     deolviando así un solo objeto/entidad de la base de datos para actualizar su información.
-    En caso de no encontrar dicho objeto/entidad se retorna un error. Un caso borde es la posibilidad
-    de que el mismo dispositivo este en varios grupos, por lo tanto, se necesita de alguna forma de
-    poder diferenciar en cual grupo esta para solo actualizar sus datos para dicho grupo.
+    En caso de no encontrar dicho objeto/entidad se crea (upsert atómico con update_or_create) y se
+    retorna 201. Un caso borde es la posibilidad de que el mismo dispositivo este en varios grupos,
+    por lo tanto, se necesita de alguna forma de poder diferenciar en cual grupo esta para solo
+    actualizar sus datos para dicho grupo; la restricción unique_device_per_group asegura que exista
+    a lo más un dispositivo por grupo.
 
     DELETE: En vez de realizar el DELETE de dispositivos teniendo en consideración sus ID's, se realiza
     teniendo en consideración el ID del grupo al cual pertenecen.
@@ -141,18 +344,74 @@ class DeviceViewSet(viewsets.ModelViewSet):
                 {"detail": ""},
                 status=400,
             )
-        try:
-            instance = Device.objects.get(
-                actual_group=actual_group, device_id=device_id
-            )
-        except:
-            return Response({"detail": "dispositivo no encontrado."}, status=404)
 
-        serializer = self.get_serializer(instance, data=request.data, partial=True)
+        serializer = DeviceUpsertSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        defaults = dict(serializer.validated_data)
+        group = defaults.pop("actual_group")
+        device_id = defaults.pop("device_id")
+        instance, created = Device.objects.update_or_create(
+            actual_group=group, device_id=device_id, defaults=defaults
+        )
+
+        return Response(
+            self.get_serializer(instance).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk", url_name="bulk_positions")
+    def bulk_positions(self, request):
+
+        """
+        Actualiza en una sola transacción las posiciones de varios dispositivos de un grupo.
+
+        Recibe {"actual_group": ID, "positions": [{"device_id", "latitude", "longitude", "altitude",
+        "timestamp"}, ...]} y aplica los cambios con bulk_update. Las posiciones más antiguas que la
+        última modificación guardada del dispositivo se rechazan, y si un dispositivo aparece varias
+        veces solo se aplica la posición más reciente. bulk_update no emite señales, por lo que la
+        caché de entradas de la simulación del grupo se invalida explícitamente.
+
+        Retorna la cantidad de dispositivos actualizados y los device_id rechazados o no encontrados.
+        """
+
+        serializer = BulkPositionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        group = serializer.validated_data["actual_group"]
+        now = timezone.now()
+
+        latest = {}
+        for position in serializer.validated_data["positions"]:
+            position["timestamp"] = position.get("timestamp") or now
+            previous = latest.get(position["device_id"])
+            if previous is None or position["timestamp"] > previous["timestamp"]:
+                latest[position["device_id"]] = position
+
+        updated, stale = [], []
+        with transaction.atomic():
+            devices = Device.objects.select_for_update().filter(
+                actual_group=group, device_id__in=list(latest)
+            )
+            for device in devices:
+                position = latest.pop(device.device_id)
+                if position["timestamp"] < device.modified_at:
+                    stale.append(device.device_id)
+                    continue
+                device.latitude = position["latitude"]
+                device.longitude = position["longitude"]
+                device.altitude = position.get("altitude", device.altitude)
+                # Un reloj adelantado en el dispositivo no debe dejar fechas en el futuro
+                device.modified_at = min(position["timestamp"], now)
+                updated.append(device)
+            Device.objects.bulk_update(
+                updated, ["latitude", "longitude", "altitude", "modified_at"]
+            )
 
-        return Response(serializer.data)
+        if updated:
+            invalidate_simulation_context(group.id)
+        return Response(
+            {"updated": len(updated), "stale": stale, "not_found": list(latest)},
+            status=200,
+        )
 
     @action(detail=False, methods=["delete"], url_name="delete_by_group")
     def delete_by_group(self, request):
@@ -181,26 +440,22 @@ class GroupRetrieveView(viewsets.ModelViewSet):
     """
     
     View para el modelo de Group. Solo esta modificado la forma en la que realiza el GET.
-    Esta modificación lo que realiza es tomar el primer elemento de la columna 
-    "modified_at" del grupo con ID "X" y restarlo al tiempo actual del sistema para así obtener
-    la cantidad de horas desde la última vez que se utilizaron los grupos creados.
+    Esta modificación lo que realiza es anotar cada grupo con la fecha del último dispositivo
+    modificado (una sola consulta) y restarla al tiempo actual del sistema para así obtener
+    la cantidad de horas desde la última vez que se utilizaron los grupos creados. La lectura no
+    escribe en la base de datos; el valor guardado se actualiza con el comando "update_last_time_used".
     
     """
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
 
     def get_queryset(self):
-        groups = Group.objects.all()
-        current_time = timezone.now()
-        for group in groups:
-            device = Device.objects.filter(actual_group=group).order_by("-modified_at").first()
-            if device:
-                difference = current_time - device.modified_at
-                group.last_time_used = difference.total_seconds() / 3600
-            else:
-                group.last_time_used = 100
-            group.save()
-        return groups
+        return Group.objects.annotate(last_device_at=Max("device__modified_at"))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["now"] = timezone.now()
+        return context
 
 class RefPointView(viewsets.ModelViewSet):
 
@@ -213,9 +468,34 @@ class RefPointView(viewsets.ModelViewSet):
     lookup_field = "actual_group"
 
 class ImagenViewSet(viewsets.ModelViewSet):
+
+    """
+    View para las imagenes modelo. Al subir o actualizar una imagen se guardan junto al archivo
+    sus pixeles y espectro como .npy, y al actualizar o eliminar una imagen se eliminan los .npy del
+    archivo anterior y se invalida su espectro en la caché de espectros (ver "spectra.py").
+    """
+
     queryset = Imagen.objects.all()
     serializer_class = ImagenSerializer
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        write_sidecars(serializer.instance.archivo.path)
+
+    def perform_update(self, serializer):
+        old_path = serializer.instance.archivo.path
+        super().perform_update(serializer)
+        if serializer.instance.archivo.path != old_path:
+            remove_sidecars(old_path)
+        write_sidecars(serializer.instance.archivo.path)
+        get_spectrum_cache().invalidate(serializer.instance.id)
+
+    def perform_destroy(self, instance):
+        image_id, path = instance.id, instance.archivo.path
+        super().perform_destroy(instance)
+        remove_sidecars(path)
+        get_spectrum_cache().invalidate(image_id)
+
 class ParametersViewSet(viewsets.ModelViewSet):
 
     """
@@ -229,6 +509,7 @@ class ParametersViewSet(viewsets.ModelViewSet):
 
 
 @api_view(["POST"])
+@renderer_classes(SIMULATION_RENDERERS)
 def simuAdmin(request):
 
     """
@@ -240,71 +521,85 @@ def simuAdmin(request):
     se logra recibiendo el grupo al cual pertenecen los dispositivos desde la petición GET
     para así proceder con la obtención de la información.
     
-    Por lo tanto, primero se recibe el ID del grupo y los parametros de simulación
-    y se utiliza para filtrar en los objetos/entidades Device, RefPoint, 
-    para luego utilizar los serializers de cada uno y así obtenerlos en 
-    tipos de datos con los que Python pueda trabajar.
+    Por lo tanto, primero se recibe el ID del grupo y los parametros de simulación, y con el ID se
+    obtienen las posiciones y tokens de los dispositivos y el punto de referencia del grupo (ver "context.py").
 
     Luego se manejan dichos datos para poder pasarlos como argumentos a las funciones "new_position" y 
-    "simulation", finalizando con el envío de los resultados al dispositivo del administrador y
-    el envío de una notificación a los dispositivos de los participantes para que realicen la simulación.
+    "simulation". El resultado se guarda como una nueva versión del grupo y se envía a los
+    participantes (ver "publish_simulation"), finalizando con el envío de los resultados al
+    dispositivo del administrador. Con "?outputs=dirty,psf" solo se entregan las imagenes
+    indicadas, en el formato pedido en el header "Accept" igual que en simuGuest.
+
+    Con "?async=true" la simulación se ejecuta en segundo plano (ver "jobs.py") y se retorna 202 con
+    el ID del trabajo y la URL para consultar su estado en "simulationJob".
     
     
     """
+    try:
+        outputs = parse_outputs(request.query_params.get("outputs"))
+    except ValueError:
+        return Response({"detail": "outputs no valido."}, status=400)
     data = ParameterGroupSerializer(data=request.data)
     if data.is_valid():
         #1
         parameters = data.validated_data["parameter"]
         id_group = request.data.get("actual_group")
-        locations = Device.objects.filter(actual_group=id_group)
-        refpoint = RefPoint.objects.filter(actual_group=id_group)
-        locations_serializer = DeviceSerializer(locations, many=True)
-        refpoint_serializer = RefPointSerializer(refpoint, many=True)
-        refpoint_data = refpoint_serializer.data
+        context = load_simulation_context(id_group)
+        error = missing_context_response(context)
+        if error is not None:
+            return error
 
         #2
-        dvice = pd.DataFrame(locations_serializer.data)
-        imagen_instance = get_object_or_404(Imagen, id=parameters["idPath"])
-        image_path = "./media/" + imagen_instance.archivo.name
-        tokenFCM = list(dvice["tokenFCM"])
-        dvice = dvice.drop(
-            ["id", "device_id", "actual_group", "modified_at", "tokenFCM", "distance"], axis=1
-        )
-        array = np.array(dvice).astype(float)
-        reference = np.array(
-            [
-                refpoint_data[0]["latitude"],
-                refpoint_data[0]["longitude"],
-                refpoint_data[0]["altitude"],
-            ]
+        if parameters["idPath"] == context.image_id and context.image_name is not None:
+            image_name = context.image_name
+        else:
+            image_name = get_object_or_404(Imagen, id=parameters["idPath"]).archivo.name
+        tokenFCM = context.tokens
+
+        loader = simulation_loader(
+            context.positions, context.reference, parameters, parameters["idPath"], image_name,
+            group=(context.group_id, context.device_ids),
         )
+        base_url = request.build_absolute_uri("/")
+
+        if request.query_params.get("async") == "true":
+            job, _ = submit_simulation_job(
+                context.group_id,
+                loader[0],
+                lambda progress: simulation_images(loader, progress=progress),
+                lambda images: publish_simulation(context.group_id, images, tokenFCM, base_url),
+            )
+            url = request.build_absolute_uri(reverse("simulation_job", args=[job.id]))
+            return Response(
+                {**SimulationJobSerializer(job).data, "url": url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": url},
+            )
 
-        new_pos = new_positions(array, reference, parameters["scale"])
-        img_dirty, img_coverage, img_sampling, img_psf = simulation(
-            parameters["observationTime"],
-            parameters["declination"],
-            parameters["samplingTime"],
-            image_path,
-            new_pos,
-            reference,
-            parameters["frequency"],
-            parameters["scheme"],
-            parameters["robust_param"]
-        )
+        images = simulation_images(loader)
 
         #3
-        message = messaging.MulticastMessage(tokens=tokenFCM)
-        response = messaging.send_each_for_multicast(message)
-        #print(response.responses[0].exception)
-        print("enviadas: ", response.success_count, "fallidas:", response.failure_count)
-        return Response(
-            [
-                {"img": img_dirty},
-                {"img": img_coverage},
-                {"img": img_sampling},
-                {"img": img_psf},
-            ],
-            status=200,
-        )
+        stored = publish_simulation(context.group_id, images, tokenFCM, base_url)
+        headers = {"X-Simulation-Version": str(stored.version)}
+        if wants_arrays(request):
+            return arrays_response(simulation_arrays(loader, outputs), outputs, headers)
+        return images_response(request, images, outputs, headers)
     else:
         return Response(data.errors, status=400)
+
+
+@api_view(["GET"])
+def simulationJob(request, job_id):
+
+    """
+    Estado de una simulación del administrador ejecutada en segundo plano. Al terminar incluye
+    las URL de las imagenes de la versión guardada.
+    """
+
+    job = get_object_or_404(SimulationJob, pk=job_id)
+    data = SimulationJobSerializer(job).data
+    if job.status == SimulationJob.DONE:
+        data["images"] = artifact_urls(
+            request.build_absolute_uri("/"), job.actual_group_id, job.version
+        )
+    return Response(data, status=200)